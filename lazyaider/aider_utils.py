@@ -1,67 +1,102 @@
+import os
 import subprocess
+import tempfile
+import threading
+import time
+
+REPO_MAP_CACHE_TTL_SECONDS = 5.0 # How long a cached repo map is reused before re-running aider
+
+# Maps (cwd, git index mtime) -> (time cached, repo map output).
+# Running 'aider --show-repo-map' costs several seconds of start-up time, so recent results are reused.
+_REPO_MAP_CACHE: dict[tuple, tuple[float, str]] = {}
+# Serializes cache misses, so concurrent callers (e.g. several plans generated at once) share one aider run.
+_REPO_MAP_LOCK = threading.Lock()
+
+def _git_index_mtime() -> float | None:
+    """
+    Returns the mtime of the '.git/index' file in the current directory, or None if it cannot be read.
+    This is a single stat call used as a cheap signal that the set of tracked files changed.
+    """
+    try:
+        return os.stat(os.path.join(".git", "index")).st_mtime
+    except OSError:
+        return None
 
 def get_aider_repo_map() -> str:
+    """
+    Returns the output of _run_aider_repo_map(), reusing a cached result if it was produced
+    less than REPO_MAP_CACHE_TTL_SECONDS ago in the same directory with an unchanged git index.
+    Only successful runs are cached, so a transient failure is retried on the next call.
+    Use get_aider_repo_map.cache_clear() to force the next call to re-run aider.
+    """
+    with _REPO_MAP_LOCK:
+        cache_key = (os.getcwd(), _git_index_mtime())
+        cached_entry = _REPO_MAP_CACHE.get(cache_key)
+        if cached_entry is not None and time.monotonic() - cached_entry[0] < REPO_MAP_CACHE_TTL_SECONDS:
+            return cached_entry[1]
+
+        repo_map, succeeded = _run_aider_repo_map()
+        if succeeded:
+            _REPO_MAP_CACHE.clear() # Only the most recent key is worth keeping
+            _REPO_MAP_CACHE[cache_key] = (time.monotonic(), repo_map)
+        return repo_map
+
+get_aider_repo_map.cache_clear = _REPO_MAP_CACHE.clear
+
+def _run_aider_repo_map() -> tuple[str, bool]:
     """
     Runs 'aider --show-repo-map' and captures its output,
-    returning only the content after the first empty line.
+    returning only the content after the first empty line, and whether the command succeeded.
     An empty line is defined as a line containing only whitespace characters (or no characters)
     followed by a newline.
 
-    If the command fails, it returns a string containing the error message.
+    If the command fails, it returns a string containing the error message (and False).
     If the command succeeds but no empty line is found, or if there's no content 
     after the first empty line, it returns an empty string.
     """
     command = ["aider", "--show-repo-map"]
     try:
-        # Set encoding to utf-8 to handle potential special characters in file paths
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=False, # We will check returncode manually
-            encoding='utf-8' 
-        )
-
-        if result.returncode != 0:
-            error_message = f"Error running '{' '.join(command)}':\n"
-            error_message += f"Return code: {result.returncode}\n"
-            if result.stdout:
-                error_message += f"Stdout:\n{result.stdout.strip()}\n"
-            if result.stderr:
-                error_message += f"Stderr:\n{result.stderr.strip()}\n"
-            return error_message.strip()
+        # Stream stdout so the header lines are dropped as they are read, instead of buffering
+        # the whole output and scanning it afterwards. stderr goes to a temp file so a chatty
+        # stderr can't fill its pipe and block aider while we are still reading stdout.
+        with tempfile.TemporaryFile() as stderr_file:
+            # Set encoding to utf-8 to handle potential special characters in file paths
+            with subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                text=True,
+                encoding='utf-8'
+            ) as process:
+                header_lines = []
+                for line in process.stdout:
+                    header_lines.append(line) # Kept only for the error message below
+                    # Check if the line (including its newline) is only whitespace
+                    if line.isspace():
+                        break
+                # Everything after the first empty line (or "" if there was none, or nothing after it)
+                content_after_empty_line = process.stdout.read()
+                returncode = process.wait()
 
-        stdout_content = result.stdout
-        
-        lines = stdout_content.splitlines(True) # Keep newlines to preserve original structure
-        current_char_offset = 0
-        
-        for line_with_newline in lines:
-            # Content of the line, excluding its own trailing newline character(s)
-            line_content_stripped_of_newline = line_with_newline.rstrip('\r\n')
-            
-            # Calculate the starting position of the *next* line's content
-            offset_after_this_line = current_char_offset + len(line_with_newline)
+            if returncode != 0:
+                stdout_content = "".join(header_lines) + content_after_empty_line
+                stderr_file.seek(0)
+                stderr_content = stderr_file.read().decode('utf-8', errors='replace')
+                error_message = f"Error running '{' '.join(command)}':\n"
+                error_message += f"Return code: {returncode}\n"
+                if stdout_content:
+                    error_message += f"Stdout:\n{stdout_content.strip()}\n"
+                if stderr_content:
+                    error_message += f"Stderr:\n{stderr_content.strip()}\n"
+                return error_message.strip(), False
 
-            # Check if the current line (when stripped of its own newline and then whitespace) is empty
-            if line_content_stripped_of_newline.strip() == "":
-                # This is an empty line. We want the content that starts *after* this entire line.
-                if offset_after_this_line >= len(stdout_content):
-                    # The empty line was the last part of the output, or output ends with it.
-                    # Thus, there is no content after it.
-                    return "" 
-                return stdout_content[offset_after_this_line:]
-            
-            current_char_offset = offset_after_this_line
-            
-        # No empty line was found in the output
-        return ""
+        return content_after_empty_line, True
 
     except FileNotFoundError:
-        return f"Error: '{command[0]}' command not found. Please ensure Aider is installed and in your PATH."
+        return f"Error: '{command[0]}' command not found. Please ensure Aider is installed and in your PATH.", False
     except Exception as e:
         # Catch any other unexpected exceptions during subprocess execution.
-        return f"An unexpected error occurred while running '{' '.join(command)}': {type(e).__name__} - {e}"
+        return f"An unexpected error occurred while running '{' '.join(command)}': {type(e).__name__} - {e}", False
 
 if __name__ == '__main__':
     # Example usage for testing
@@ -1,25 +1,37 @@
+import atexit
+import copy
 import os
 import sys
-import yaml
+import threading
 
 CONFIG_FILENAME = ".lazyaider.conf.yml"
 LAZYAIDER_BASE_DIR = ".lazyaider" # Base directory for lazyaider files
 USER_PLANNER_PROMPT_FILENAME = "planner_prompt.md" # User-editable global planner prompt
 
-# Configuration Keys
-KEY_SIDEPANE_PERCENT_WIDTH = "sidepane_percent_width"
-KEY_MANAGED_SESSIONS = "managed_sessions"
-KEY_THEME_NAME = "theme_name"
-KEY_LLM_MODEL = "llm_model"
-KEY_LLM_API_KEY = "llm_api_key"
-KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH = "plan_generation_prompt_override_path" # Can be global or per-session
-KEY_SESSION_ACTIVE_PLAN_NAME = "active_plan_name" # Stores the active plan directory name for a session
-KEY_SESSION_PLAN_PROGRESS = "plan_progress" # Stores progress for each plan within a session
-KEY_LAST_AIDER_STEP = "last_aider_step" # Stores the index of the last step sent to Aider for a plan
-KEY_TEXT_EDITOR = "text_editor" # Command to launch the external text editor
-KEY_DELAY_SEND_INPUT = "delay_send_input" # Delay in seconds after sending input before Enter/M-Enter
-KEY_LABEL_COLOR_COMPLETED = "label_color_completed" # Color for completed section labels
-KEY_LABEL_COLOR_CURRENT = "label_color_current" # Color for the current/last processed section label
+# Configuration Keys (interned so lookups against keys loaded from the file can match on identity)
+KEY_SIDEPANE_PERCENT_WIDTH = sys.intern("sidepane_percent_width")
+KEY_MANAGED_SESSIONS = sys.intern("managed_sessions")
+KEY_THEME_NAME = sys.intern("theme_name")
+KEY_LLM_MODEL = sys.intern("llm_model")
+KEY_LLM_API_KEY = sys.intern("llm_api_key")
+KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH = sys.intern("plan_generation_prompt_override_path") # Can be global or per-session
+KEY_SESSION_ACTIVE_PLAN_NAME = sys.intern("active_plan_name") # Stores the active plan directory name for a session
+KEY_SESSION_PLAN_PROGRESS = sys.intern("plan_progress") # Stores progress for each plan within a session
+KEY_LAST_AIDER_STEP = sys.intern("last_aider_step") # Stores the index of the last step sent to Aider for a plan
+KEY_TEXT_EDITOR = sys.intern("text_editor") # Command to launch the external text editor
+KEY_DELAY_SEND_INPUT = sys.intern("delay_send_input") # Delay in seconds after sending input before Enter/M-Enter
+KEY_LABEL_COLOR_COMPLETED = sys.intern("label_color_completed") # Color for completed section labels
+KEY_LABEL_COLOR_CURRENT = sys.intern("label_color_current") # Color for the current/last processed section label
+KEY_MAX_PARALLEL_LLM = sys.intern("max_parallel_llm") # Max concurrent LLM calls when generating plans for several features at once
+KEY_LLM_REQUESTS_PER_MINUTE = sys.intern("llm_requests_per_minute") # Optional cap on LLM calls started per minute when generating several plans
+KEY_LLM_NUM_RETRIES = sys.intern("llm_num_retries") # Retries of an LLM call on transient errors (rate limits, timeouts, 5xx)
+KEY_LLM_CACHE_ENABLED = sys.intern("llm_cache_enabled") # Reuse previously generated plans for identical requests
+KEY_LLM_CACHE_TTL = sys.intern("llm_cache_ttl") # Seconds a cached plan stays valid
+KEY_LLM_SEMANTIC_CACHE_ENABLED = sys.intern("llm_semantic_cache_enabled") # Also reuse plans for reworded descriptions (optional dependency)
+KEY_SEMANTIC_CACHE_THRESHOLD = sys.intern("semantic_cache_threshold") # Minimum cosine similarity for a semantic cache hit
+KEY_MAX_FEATURE_CHARS = sys.intern("max_feature_chars") # Longest feature description sent to the LLM, in characters
+KEY_LLM_MODEL_LIST = sys.intern("llm_model_list") # Optional litellm.Router deployments to spread LLM calls over
+KEY_LLM_HTTP2 = sys.intern("llm_http2") # Send LLM requests over a shared HTTP/2 connection pool (optional dependency)
 
 DEFAULT_SIDEPANE_PERCENT_WIDTH = 20
 DEFAULT_THEME_NAME = "light" # Textual's default theme
@@ -30,8 +42,39 @@ DEFAULT_TEXT_EDITOR = "nano" # Default external text editor command
 DEFAULT_DELAY_SEND_INPUT = 0.5 # Default delay in seconds
 DEFAULT_LABEL_COLOR_COMPLETED = "green" # Default color for completed labels
 DEFAULT_LABEL_COLOR_CURRENT = "cyan" # Default color for current label
+DEFAULT_MAX_PARALLEL_LLM = 8 # Default cap on concurrent LLM calls, to stay under provider rate limits
+DEFAULT_LLM_REQUESTS_PER_MINUTE = None # No rate limit beyond max_parallel_llm
+DEFAULT_LLM_NUM_RETRIES = 3
+DEFAULT_LLM_CACHE_ENABLED = True
+DEFAULT_LLM_CACHE_TTL = 7 * 24 * 60 * 60 # One week
+DEFAULT_LLM_SEMANTIC_CACHE_ENABLED = False # Off by default: pulls in sentence-transformers and an embedding model
+DEFAULT_SEMANTIC_CACHE_THRESHOLD = 0.92
+DEFAULT_MAX_FEATURE_CHARS = 8000
+DEFAULT_LLM_MODEL_LIST = None # Call 'llm_model' directly
+DEFAULT_LLM_HTTP2 = False # Off by default: needs the 'h2' package, and litellm's own clients work everywhere
+
+CONFIG_FLUSH_DELAY_SECONDS = 0.2 # Settings changes within this window are written to disk together
+
+_UNSET = object() # Sentinel: config path has not been resolved yet
+_config_path_cache: "str | None | object" = _UNSET
 
 def find_config_file() -> str | None:
+    """
+    Returns the path to the config file, or None if there is none.
+    The result of the search is cached for the life of the process;
+    call invalidate_config_path_cache() to force a new search.
+    """
+    global _config_path_cache
+    if _config_path_cache is _UNSET:
+        _config_path_cache = _find_config_file_uncached()
+    return _config_path_cache
+
+def invalidate_config_path_cache() -> None:
+    """Forgets the cached config path so the next find_config_file() call searches again."""
+    global _config_path_cache
+    _config_path_cache = _UNSET
+
+def _find_config_file_uncached() -> str | None:
     """
     Searches for the config file in the current directory and then in the home directory.
     Returns the path to the config file if found, otherwise None.
@@ -48,6 +91,97 @@ def find_config_file() -> str | None:
 
     return None
 
+def _import_yaml():
+    """
+    Imports PyYAML on demand and returns (yaml, Loader, Dumper).
+    The libyaml-backed C classes are preferred; the pure-Python ones are used if PyYAML was built without libyaml.
+    """
+    import yaml # Deferred so importing this module doesn't pay for PyYAML
+    try:
+        from yaml import CSafeLoader as loader_class, CSafeDumper as dumper_class
+    except ImportError:
+        from yaml import SafeLoader as loader_class, SafeDumper as dumper_class
+    return yaml, loader_class, dumper_class
+
+def _check_non_empty(value: str) -> str | None:
+    """Returns a problem description if the string is empty or whitespace-only."""
+    return "is empty" if not value.strip() else None
+
+def _check_non_negative(value: int | float) -> str | None:
+    """Returns a problem description if the number is negative."""
+    return f"('{value}') is negative" if value < 0 else None
+
+def _check_positive(value: int) -> str | None:
+    """Returns a problem description if the number is not at least 1."""
+    return f"('{value}') is not positive" if value < 1 else None
+
+def _check_positive_or_none(value: int | None) -> str | None:
+    """Like _check_positive, but None (not configured) is accepted."""
+    return None if value is None else _check_positive(value)
+
+def _check_similarity(value: int | float) -> str | None:
+    """Returns a problem description if the number is not a usable cosine similarity threshold."""
+    return f"('{value}') is not between 0 and 1" if not 0 < value <= 1 else None
+
+def _check_model_list(value: list | None) -> str | None:
+    """Returns a problem description if the list has an entry that is not a litellm.Router deployment."""
+    if value is None:
+        return None
+    for entry in value:
+        if not (
+            isinstance(entry, dict)
+            and isinstance(entry.get("model_name"), str)
+            and isinstance(entry.get("litellm_params"), dict)
+            and isinstance(entry["litellm_params"].get("model"), str)
+        ):
+            return "has an entry without a 'model_name' and 'litellm_params' with a 'model'"
+    return None
+
+def _empty_to_none(value: str | None) -> str | None:
+    """Treats an empty string as not configured."""
+    return None if value == "" else value
+
+# Validation rules for the top-level scalar settings, applied in order by load_config:
+# (key, accepted types, description of the accepted types, default, extra check, normalizer).
+# The extra check returns a problem description (falling back to the default) or None.
+_SCALAR_SETTINGS_SCHEMA = (
+    (KEY_SIDEPANE_PERCENT_WIDTH, (int,), "an integer", DEFAULT_SIDEPANE_PERCENT_WIDTH, None, None),
+    (KEY_THEME_NAME, (str,), "a string", DEFAULT_THEME_NAME, None, None),
+    (KEY_LLM_MODEL, (str,), "a string", DEFAULT_LLM_MODEL, _check_non_empty, None),
+    (KEY_LLM_API_KEY, (str, type(None)), "a string or null", DEFAULT_LLM_API_KEY, None, None),
+    (KEY_TEXT_EDITOR, (str, type(None)), "a string or null", DEFAULT_TEXT_EDITOR, None, _empty_to_none),
+    (KEY_DELAY_SEND_INPUT, (int, float), "a number", DEFAULT_DELAY_SEND_INPUT, _check_non_negative, None),
+    (KEY_LABEL_COLOR_COMPLETED, (str,), "a string", DEFAULT_LABEL_COLOR_COMPLETED, _check_non_empty, None),
+    (KEY_LABEL_COLOR_CURRENT, (str,), "a string", DEFAULT_LABEL_COLOR_CURRENT, _check_non_empty, None),
+    (KEY_MAX_PARALLEL_LLM, (int,), "an integer", DEFAULT_MAX_PARALLEL_LLM, _check_positive, None),
+    (KEY_LLM_REQUESTS_PER_MINUTE, (int, type(None)), "an integer or null", DEFAULT_LLM_REQUESTS_PER_MINUTE, _check_positive_or_none, None),
+    (KEY_LLM_NUM_RETRIES, (int,), "an integer", DEFAULT_LLM_NUM_RETRIES, _check_non_negative, None),
+    (KEY_LLM_CACHE_ENABLED, (bool,), "a boolean", DEFAULT_LLM_CACHE_ENABLED, None, None),
+    (KEY_LLM_CACHE_TTL, (int,), "an integer", DEFAULT_LLM_CACHE_TTL, _check_positive, None),
+    (KEY_LLM_SEMANTIC_CACHE_ENABLED, (bool,), "a boolean", DEFAULT_LLM_SEMANTIC_CACHE_ENABLED, None, None),
+    (KEY_SEMANTIC_CACHE_THRESHOLD, (int, float), "a number", DEFAULT_SEMANTIC_CACHE_THRESHOLD, _check_similarity, None),
+    (KEY_MAX_FEATURE_CHARS, (int, type(None)), "an integer or null", DEFAULT_MAX_FEATURE_CHARS, _check_positive_or_none, None),
+    (KEY_LLM_MODEL_LIST, (list, type(None)), "a list or null", DEFAULT_LLM_MODEL_LIST, _check_model_list, None),
+    (KEY_LLM_HTTP2, (bool,), "a boolean", DEFAULT_LLM_HTTP2, None, None),
+)
+
+_MISSING = object() # Sentinel: key not present in the config file
+
+def _has_accepted_type(value, accepted_types: tuple[type, ...]) -> bool:
+    """isinstance, except that a bool is not accepted as an int or float (YAML 'true' is not a count)."""
+    if isinstance(value, bool) and bool not in accepted_types:
+        return False
+    return isinstance(value, accepted_types)
+
+def _resolve_prompt_path(path_val: str, config_path: str | None) -> str:
+    """Expands '~' and makes a relative prompt path absolute, relative to the config file's directory if known."""
+    expanded_path = os.path.expanduser(path_val)
+    if not os.path.isabs(expanded_path) and path_val: # only if not empty string
+        if config_path:
+            return os.path.abspath(os.path.join(os.path.dirname(config_path), expanded_path))
+        return os.path.abspath(expanded_path)
+    return expanded_path
+
 def load_config() -> dict:
     """
     Loads configuration from the YAML file.
@@ -57,18 +191,29 @@ def load_config() -> dict:
     config = {}
 
     if config_path:
+        yaml, loader_class, _ = _import_yaml()
         try:
             with open(config_path, 'r') as f:
-                config = yaml.safe_load(f) or {}
+                config = yaml.load(f, Loader=loader_class) or {}
         except Exception as e:
             print(f"Warning: Could not load or parse config file {config_path}: {e}", file=sys.stderr)
             config = {} # Reset to empty dict on error
-
-    # Apply defaults
-    if not isinstance(config.get(KEY_SIDEPANE_PERCENT_WIDTH), int):
-        if KEY_SIDEPANE_PERCENT_WIDTH in config: # Value exists but is not an int
-             print(f"Warning: '{KEY_SIDEPANE_PERCENT_WIDTH}' in {config_path or 'config'} is not an integer. Using default value.", file=sys.stderr)
-        config[KEY_SIDEPANE_PERCENT_WIDTH] = DEFAULT_SIDEPANE_PERCENT_WIDTH
+        if isinstance(config, dict):
+            # Keys parsed from YAML are fresh strings; intern them to share identity with the KEY_* constants
+            config = {sys.intern(k) if isinstance(k, str) else k: v for k, v in config.items()}
+
+    # Apply defaults to the scalar settings
+    for key, accepted_types, types_description, default, check, normalize in _SCALAR_SETTINGS_SCHEMA:
+        value = config.get(key, _MISSING)
+        if value is _MISSING or (value is None and type(None) not in accepted_types):
+            config[key] = default # An explicit null for a setting that can't be null means "use the default"
+            continue
+        problem = f"is not {types_description}" if not _has_accepted_type(value, accepted_types) else (check(value) if check else None)
+        if problem:
+            print(f"Warning: '{key}' in {config_path or 'config'} {problem}. Using default value.", file=sys.stderr)
+            config[key] = default
+        elif normalize:
+            config[key] = normalize(value)
 
     # Handle KEY_MANAGED_SESSIONS: ensure it's a dict, migrate from list if necessary
     managed_sessions_data = config.get(KEY_MANAGED_SESSIONS)
@@ -107,142 +252,148 @@ def load_config() -> dict:
                 print(f"Warning: '{KEY_LAST_AIDER_STEP}' for plan '{plan_name}' in session '{session_name}' is not an integer. Resetting.", file=sys.stderr)
                 progress_data[KEY_LAST_AIDER_STEP] = None # Or del progress_data[KEY_LAST_AIDER_STEP]
 
-
-    if not isinstance(config.get(KEY_THEME_NAME), str):
-        if KEY_THEME_NAME in config: # Value exists but is not a str
-            print(f"Warning: '{KEY_THEME_NAME}' in {config_path or 'config'} is not a string. Using default value.", file=sys.stderr)
-        config[KEY_THEME_NAME] = DEFAULT_THEME_NAME
-
-    if not isinstance(config.get(KEY_LLM_MODEL), str) or not config.get(KEY_LLM_MODEL, "").strip():
-        if KEY_LLM_MODEL in config and config.get(KEY_LLM_MODEL) is not None : # Value exists but is not a non-empty str
-            print(f"Warning: '{KEY_LLM_MODEL}' in {config_path or 'config'} is not a valid non-empty string. Using default value.", file=sys.stderr)
-        config[KEY_LLM_MODEL] = DEFAULT_LLM_MODEL
-
-    # Ensure llm_api_key is a string or None
-    if KEY_LLM_API_KEY in config and not (isinstance(config.get(KEY_LLM_API_KEY), str) or config.get(KEY_LLM_API_KEY) is None):
-        print(f"Warning: '{KEY_LLM_API_KEY}' in {config_path or 'config'} is not a string or null. Using default value.", file=sys.stderr)
-        config[KEY_LLM_API_KEY] = DEFAULT_LLM_API_KEY
-    elif KEY_LLM_API_KEY not in config:
-        config[KEY_LLM_API_KEY] = DEFAULT_LLM_API_KEY
+        # Process session-specific plan_generation_prompt_override_path
+        session_prompt_path = session_settings.get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH)
+        if session_prompt_path is not None and not isinstance(session_prompt_path, str):
+            print(f"Warning: Session '{session_name}' '{KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH}' in {config_path or 'config'} is not a string or null. Ignoring session override.", file=sys.stderr)
+            del session_settings[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] # Remove invalid entry
+        elif isinstance(session_prompt_path, str):
+            session_settings[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = _resolve_prompt_path(session_prompt_path, config_path)
+            # No default for session-specific, it's either there and valid, or not used.
 
     # Ensure global plan_generation_prompt_override_path is a string or None and process it
     global_prompt_path = config.get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH)
     if global_prompt_path is not None and not isinstance(global_prompt_path, str):
         print(f"Warning: Global '{KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH}' in {config_path or 'config'} is not a string or null. Using default value (None).", file=sys.stderr)
         config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = DEFAULT_PLAN_GENERATION_PROMPT_OVERRIDE_PATH
-    elif KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH not in config: # Not present at all
+    elif isinstance(global_prompt_path, str):
+        config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = _resolve_prompt_path(global_prompt_path, config_path)
+    else: # Not present at all, or null
         config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = DEFAULT_PLAN_GENERATION_PROMPT_OVERRIDE_PATH
 
-    if isinstance(config.get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH), str):
-        path_val = config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH]
-        expanded_path = os.path.expanduser(path_val)
-        if not os.path.isabs(expanded_path) and path_val: # only if not empty string
-            if config_path:
-                config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = os.path.abspath(os.path.join(os.path.dirname(config_path), expanded_path))
-            else:
-                config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = os.path.abspath(expanded_path)
-        else:
-            config[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = expanded_path
-
-    # Process session-specific plan_generation_prompt_override_path
-    for session_name, session_settings in config.get(KEY_MANAGED_SESSIONS, {}).items():
-        if not isinstance(session_settings, dict): # Should have been handled already, but defensive
-            continue
-
-        session_prompt_path = session_settings.get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH)
-        if session_prompt_path is not None and not isinstance(session_prompt_path, str):
-            print(f"Warning: Session '{session_name}' '{KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH}' in {config_path or 'config'} is not a string or null. Ignoring session override.", file=sys.stderr)
-            if KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH in session_settings:
-                 del session_settings[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] # Remove invalid entry
-        elif isinstance(session_prompt_path, str):
-            expanded_path = os.path.expanduser(session_prompt_path)
-            if not os.path.isabs(expanded_path) and session_prompt_path: # only if not empty string
-                if config_path:
-                    session_settings[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = os.path.abspath(os.path.join(os.path.dirname(config_path), expanded_path))
-                else:
-                    session_settings[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = os.path.abspath(expanded_path)
-            else:
-                session_settings[KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH] = expanded_path
-            # No default for session-specific, it's either there and valid, or not used.
-
-    # Ensure text_editor is a string or None
-    text_editor_val = config.get(KEY_TEXT_EDITOR)
-    if text_editor_val is not None and not isinstance(text_editor_val, str):
-        print(f"Warning: '{KEY_TEXT_EDITOR}' in {config_path or 'config'} is not a string. Using default (None).", file=sys.stderr)
-        config[KEY_TEXT_EDITOR] = DEFAULT_TEXT_EDITOR
-    elif text_editor_val == "": # Treat empty string as not configured (effectively None)
-        config[KEY_TEXT_EDITOR] = None
-    elif KEY_TEXT_EDITOR not in config: # Not present at all
-        config[KEY_TEXT_EDITOR] = DEFAULT_TEXT_EDITOR
-
-    # Ensure delay_send_input is a non-negative float or int
-    delay_val = config.get(KEY_DELAY_SEND_INPUT)
-    is_valid_type = isinstance(delay_val, (float, int))
-    is_valid_value = is_valid_type and delay_val >= 0
-
-    if not is_valid_value:
-        if KEY_DELAY_SEND_INPUT in config: # Key exists but value is invalid
-            if not is_valid_type:
-                print(f"Warning: '{KEY_DELAY_SEND_INPUT}' in {config_path or 'config'} is not a number. Using default value {DEFAULT_DELAY_SEND_INPUT}.", file=sys.stderr)
-            elif delay_val < 0: # is_valid_type must be true here
-                print(f"Warning: '{KEY_DELAY_SEND_INPUT}' in {config_path or 'config'} ('{delay_val}') is negative. Using default value {DEFAULT_DELAY_SEND_INPUT}.", file=sys.stderr)
-        config[KEY_DELAY_SEND_INPUT] = DEFAULT_DELAY_SEND_INPUT
-    # If it was valid and present, it's kept. If it was None (not in config), it's set to default by the above.
-
-    # Ensure label_color_completed is a string
-    if not isinstance(config.get(KEY_LABEL_COLOR_COMPLETED), str):
-        if KEY_LABEL_COLOR_COMPLETED in config: # Value exists but is not a str
-            print(f"Warning: '{KEY_LABEL_COLOR_COMPLETED}' in {config_path or 'config'} is not a string. Using default value.", file=sys.stderr)
-        config[KEY_LABEL_COLOR_COMPLETED] = DEFAULT_LABEL_COLOR_COMPLETED
-    elif not config.get(KEY_LABEL_COLOR_COMPLETED, "").strip(): # Is an empty or whitespace-only string
-        print(f"Warning: '{KEY_LABEL_COLOR_COMPLETED}' in {config_path or 'config'} is empty. Using default value.", file=sys.stderr)
-        config[KEY_LABEL_COLOR_COMPLETED] = DEFAULT_LABEL_COLOR_COMPLETED
-
-    # Ensure label_color_current is a string
-    if not isinstance(config.get(KEY_LABEL_COLOR_CURRENT), str):
-        if KEY_LABEL_COLOR_CURRENT in config: # Value exists but is not a str
-            print(f"Warning: '{KEY_LABEL_COLOR_CURRENT}' in {config_path or 'config'} is not a string. Using default value.", file=sys.stderr)
-        config[KEY_LABEL_COLOR_CURRENT] = DEFAULT_LABEL_COLOR_CURRENT
-    elif not config.get(KEY_LABEL_COLOR_CURRENT, "").strip(): # Is an empty or whitespace-only string
-        print(f"Warning: '{KEY_LABEL_COLOR_CURRENT}' in {config_path or 'config'} is empty. Using default value.", file=sys.stderr)
-        config[KEY_LABEL_COLOR_CURRENT] = DEFAULT_LABEL_COLOR_CURRENT
-
     return config
 
-def save_config(current_config: dict) -> None:
+def save_config(current_config: dict) -> bool:
     """
     Saves the given configuration dictionary to the config file.
     Uses the same search path as find_config_file, defaulting to home directory if not found.
+    Returns False if the file could not be written.
     """
+    global _config_path_cache
     config_path = find_config_file()
     if not config_path:
         # If no config file exists, create one in the home directory
         config_path = os.path.join(os.path.expanduser("~"), CONFIG_FILENAME)
         print(f"Creating new config file at: {config_path}", file=sys.stderr)
 
+    yaml, _, dumper_class = _import_yaml()
+    import tempfile
+    # Write to a temp file next to the real one and rename it over, so a crash mid-write
+    # never leaves a truncated config. realpath keeps a symlinked config file a symlink.
+    target_path = os.path.realpath(config_path)
+    target_dir = os.path.dirname(target_path)
+    tmp_path = None
     try:
-        with open(config_path, 'w') as f:
-            yaml.dump(current_config, f, sort_keys=False)
+        with tempfile.NamedTemporaryFile('w', dir=target_dir, prefix=f".{CONFIG_FILENAME}.", suffix=".tmp", delete=False) as tmp:
+            tmp_path = tmp.name
+            yaml.dump(current_config, tmp, Dumper=dumper_class, sort_keys=False)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        if os.path.exists(target_path): # Keep the existing file's permissions
+            os.chmod(tmp_path, os.stat(target_path).st_mode & 0o7777)
+        os.replace(tmp_path, target_path)
+        tmp_path = None
+        _config_path_cache = config_path # The file now exists, so later searches would find it
+        return True
     except Exception as e:
         print(f"Error: Could not save config file {config_path}: {e}", file=sys.stderr)
-
-# Load configuration when the module is imported
-settings = load_config()
+        return False
+    finally:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+# Debounced saving: updaters mark the settings dirty and a timer writes them once the burst is over.
+# The timer thread writes while other threads may keep updating, so every updater changes settings
+# with _settings_lock held, and the flush dumps a copy taken under the same lock.
+_settings_lock = threading.RLock()
+
+def _get_settings() -> dict:
+    """
+    Returns the settings dict, loading the config file on first use. Once loaded, the dict is stored
+    as the module global 'settings', so later config.settings lookups no longer go through __getattr__.
+    """
+    loaded_settings = globals().get("settings")
+    if loaded_settings is None:
+        with _settings_lock:
+            loaded_settings = globals().get("settings")
+            if loaded_settings is None:
+                loaded_settings = load_config()
+                globals()["settings"] = loaded_settings
+    return loaded_settings
+
+def __getattr__(name: str):
+    """
+    Loads the configuration on the first access to config.settings (PEP 562), rather than when
+    the module is imported, so importing it doesn't pay for PyYAML and parsing the config file.
+    """
+    if name == "settings":
+        return _get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+_save_lock = threading.Lock() # Serializes writes, so an older snapshot can't overwrite a newer one
+_flush_timer: threading.Timer | None = None
+_dirty = False
+
+def _schedule_flush() -> None:
+    """Marks the settings dirty and (re)starts the timer that writes them to disk."""
+    global _flush_timer, _dirty
+    with _settings_lock:
+        _dirty = True
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+        _flush_timer = threading.Timer(CONFIG_FLUSH_DELAY_SECONDS, flush_config)
+        _flush_timer.daemon = True # flush_config also runs at exit, so don't hold up shutdown
+        _flush_timer.start()
+
+def flush_config() -> None:
+    """
+    Writes pending settings changes to the config file immediately.
+    Must be called before the process is replaced or killed (e.g. os.execvp, tmux kill-session),
+    since neither runs atexit handlers.
+    """
+    global _flush_timer, _dirty
+    with _save_lock:
+        with _settings_lock:
+            if _flush_timer is not None:
+                _flush_timer.cancel()
+                _flush_timer = None
+            if not _dirty:
+                return
+            _dirty = False
+            snapshot = copy.deepcopy(_get_settings())
+        if not save_config(snapshot):
+            with _settings_lock:
+                _dirty = True # Keep the changes pending, so the next flush (at the latest, at exit) retries
+
+atexit.register(flush_config)
 
 
 def add_session_to_config(session_name: str) -> None:
     """Adds a session name to the managed_sessions dict in config and saves."""
-    managed_sessions_dict = settings.setdefault(KEY_MANAGED_SESSIONS, {})
-    if session_name not in managed_sessions_dict:
-        managed_sessions_dict[session_name] = {} # Add session with empty settings
-        save_config(settings)
+    with _settings_lock:
+        managed_sessions_dict = _get_settings().setdefault(KEY_MANAGED_SESSIONS, {})
+        if session_name not in managed_sessions_dict:
+            managed_sessions_dict[session_name] = {} # Add session with empty settings
+            _schedule_flush()
 
 def remove_session_from_config(session_name: str) -> None:
     """Removes a session name from the managed_sessions dict in config and saves."""
-    managed_sessions_dict = settings.get(KEY_MANAGED_SESSIONS, {})
-    if session_name in managed_sessions_dict:
-        del managed_sessions_dict[session_name]
-        save_config(settings)
+    with _settings_lock:
+        managed_sessions_dict = _get_settings().get(KEY_MANAGED_SESSIONS, {})
+        if managed_sessions_dict.pop(session_name, _UNSET) is not _UNSET: # One hash lookup instead of 'in' + 'del'
+            _schedule_flush()
 
 def get_plan_prompt_override_path(session_name: str | None = None) -> str | None:
     """
@@ -251,7 +402,7 @@ def get_plan_prompt_override_path(session_name: str | None = None) -> str | None
     Paths are assumed to be processed (absolute, expanded) by load_config.
     """
     if session_name:
-        session_config = settings.get(KEY_MANAGED_SESSIONS, {}).get(session_name)
+        session_config = _get_settings().get(KEY_MANAGED_SESSIONS, {}).get(session_name)
         if session_config and isinstance(session_config, dict):
             # Path should already be processed by load_config if it exists
             session_prompt_path = session_config.get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH)
@@ -259,14 +410,16 @@ def get_plan_prompt_override_path(session_name: str | None = None) -> str | None
                 return session_prompt_path
 
     # Fallback to global setting (also already processed by load_config)
-    return settings.get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH)
+    return _get_settings().get(KEY_PLAN_GENERATION_PROMPT_OVERRIDE_PATH)
 
 def update_theme_in_config(theme_name: str) -> None:
     """Updates the theme name in config and saves."""
-    current_theme = settings.get(KEY_THEME_NAME)
-    if current_theme != theme_name:
+    with _settings_lock:
+        settings = _get_settings()
+        if settings.get(KEY_THEME_NAME) == theme_name: # Unchanged: skip the write and the flush
+            return
         settings[KEY_THEME_NAME] = theme_name
-        save_config(settings)
+        _schedule_flush()
 
 def update_session_active_plan_name(session_name: str, plan_name: str | None) -> None:
     """Updates the active plan name for a specific session in config and saves."""
@@ -274,33 +427,37 @@ def update_session_active_plan_name(session_name: str, plan_name: str | None) ->
         print("Warning: Attempted to update active plan for an unspecified session name.", file=sys.stderr)
         return
 
-    managed_sessions = settings.setdefault(KEY_MANAGED_SESSIONS, {})
-    session_settings = managed_sessions.setdefault(session_name, {})
+    with _settings_lock:
+        # Check before creating any missing entries, so a no-op update doesn't touch the settings
+        existing_session_settings = _get_settings().get(KEY_MANAGED_SESSIONS, {}).get(session_name) or {}
+        if existing_session_settings.get(KEY_SESSION_ACTIVE_PLAN_NAME) == plan_name:
+            return
 
-    current_plan_name = session_settings.get(KEY_SESSION_ACTIVE_PLAN_NAME)
-
-    if current_plan_name != plan_name:
+        managed_sessions = _get_settings().setdefault(KEY_MANAGED_SESSIONS, {})
+        session_settings = managed_sessions.setdefault(session_name, {})
         if plan_name is None:
-            if KEY_SESSION_ACTIVE_PLAN_NAME in session_settings:
-                del session_settings[KEY_SESSION_ACTIVE_PLAN_NAME]
-                save_config(settings)
+            del session_settings[KEY_SESSION_ACTIVE_PLAN_NAME]
         else:
             session_settings[KEY_SESSION_ACTIVE_PLAN_NAME] = plan_name
-            save_config(settings)
+        _schedule_flush()
 
 def update_llm_model_in_config(model_name: str) -> None:
     """Updates the LLM model name in config and saves."""
-    current_model = settings.get(KEY_LLM_MODEL)
-    if current_model != model_name:
+    with _settings_lock:
+        settings = _get_settings()
+        if settings.get(KEY_LLM_MODEL) == model_name: # Unchanged: skip the write and the flush
+            return
         settings[KEY_LLM_MODEL] = model_name
-        save_config(settings)
+        _schedule_flush()
 
 def update_llm_api_key_in_config(api_key: str | None) -> None:
     """Updates the LLM API key in config and saves."""
-    current_api_key = settings.get(KEY_LLM_API_KEY)
-    if current_api_key != api_key:
+    with _settings_lock:
+        settings = _get_settings()
+        if settings.get(KEY_LLM_API_KEY) == api_key: # Unchanged: skip the write and the flush
+            return
         settings[KEY_LLM_API_KEY] = api_key
-        save_config(settings)
+        _schedule_flush()
 
 def update_session_last_aider_step(session_name: str, plan_name: str, step_index: int | None) -> None:
     """Updates the last Aider step index for a specific plan within a session and saves."""
@@ -308,20 +465,20 @@ def update_session_last_aider_step(session_name: str, plan_name: str, step_index
         print("Warning: Session name or plan name not provided for updating last Aider step.", file=sys.stderr)
         return
 
-    managed_sessions = settings.setdefault(KEY_MANAGED_SESSIONS, {})
-    session_settings = managed_sessions.setdefault(session_name, {})
-    plan_progress_dict = session_settings.setdefault(KEY_SESSION_PLAN_PROGRESS, {})
-    plan_specific_progress = plan_progress_dict.setdefault(plan_name, {})
-
-    current_step = plan_specific_progress.get(KEY_LAST_AIDER_STEP)
+    with _settings_lock:
+        # Check before creating any missing entries, so a no-op update doesn't touch the settings
+        if get_session_last_aider_step(session_name, plan_name) == step_index:
+            return
 
-    if current_step != step_index:
+        managed_sessions = _get_settings().setdefault(KEY_MANAGED_SESSIONS, {})
+        session_settings = managed_sessions.setdefault(session_name, {})
+        plan_progress_dict = session_settings.setdefault(KEY_SESSION_PLAN_PROGRESS, {})
+        plan_specific_progress = plan_progress_dict.setdefault(plan_name, {})
         if step_index is None:
-            if KEY_LAST_AIDER_STEP in plan_specific_progress:
-                del plan_specific_progress[KEY_LAST_AIDER_STEP]
+            plan_specific_progress.pop(KEY_LAST_AIDER_STEP, None)
         else:
             plan_specific_progress[KEY_LAST_AIDER_STEP] = step_index
-        save_config(settings)
+        _schedule_flush()
 
 def get_session_last_aider_step(session_name: str, plan_name: str) -> int | None:
     """Retrieves the last Aider step index for a specific plan within a session."""
@@ -329,7 +486,7 @@ def get_session_last_aider_step(session_name: str, plan_name: str) -> int | None
         return None
     
     try:
-        step = settings[KEY_MANAGED_SESSIONS][session_name][KEY_SESSION_PLAN_PROGRESS][plan_name][KEY_LAST_AIDER_STEP]
+        step = _get_settings()[KEY_MANAGED_SESSIONS][session_name][KEY_SESSION_PLAN_PROGRESS][plan_name][KEY_LAST_AIDER_STEP]
         return int(step) if isinstance(step, int) else None
     except KeyError:
         return None
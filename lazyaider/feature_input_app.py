@@ -1,14 +1,11 @@
-import functools
+import asyncio
 import time
-import re
-import shutil
-import tempfile
 import os
-import subprocess
 from textual.app import App, ComposeResult
 from textual.binding import Binding # Add Binding
 from textual.containers import Vertical, Horizontal
-from textual.widgets import Header, Footer, Button, Static, TextArea, LoadingIndicator, RadioSet, RadioButton
+from textual.reactive import reactive
+from textual.widgets import Header, Footer, Button, Static, TextArea, RadioSet, RadioButton, Checkbox
 from textual.worker import Worker
 from textual.timer import Timer
 
@@ -16,7 +13,6 @@ from textual.timer import Timer
 # generate_plan is only used in 'create_plan' mode
 # from .llm_planner import generate_plan
 from . import config # Import config to access settings like model name
-from . import tmux_utils # Import the whole module
 from .prompt import PLAN_GENERATION_PROMPT_TEMPLATE # Import the default template
 
 class FeatureInputApp(App[str | tuple[str, str] | None]):
@@ -40,6 +36,18 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
     STATE_DISPLAY_PLAN = "display_plan"    # Only for 'create_plan'
     STATE_EDIT_PLANNER_PROMPT = "edit_planner_prompt" # New state for editing the planner prompt
 
+    # Assigning a different state runs watch_current_ui_state; assigning the current state is a no-op.
+    # init=False: on_mount applies the initial state itself, once the widgets it needs are cached.
+    current_ui_state: reactive[str] = reactive(STATE_INPUT_FEATURE, init=False)
+
+    # In multi-feature mode, the description is split on this line into one plan request per feature
+    MULTI_FEATURE_DELIMITER = "\n---\n"
+
+    # Loading message, formatted once per generation; the 1Hz tick only appends the elapsed seconds
+    LOADING_MESSAGE_TEMPLATE = "Generating plan with {model_name}, please wait..."
+    # Spinner frames prepended to the loading message, advanced by the same 1Hz tick as the elapsed time
+    SPINNER_FRAMES = "⠋⠙⠹⠸⠼⠴⠦⠧"
+
     def __init__(self,
                  mode: str = "create_plan", # "create_plan" or "edit_section"
                  initial_text: str | None = None,
@@ -50,14 +58,25 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
         self.custom_window_title = window_title
 
         # Theme will be set in on_mount
-        self.current_ui_state = self.STATE_INPUT_FEATURE
         self.generated_plan_content: str | None = None # For 'create_plan' mode
         self.feature_description_content: str | None = None # For 'create_plan' mode (original feature desc)
+        self._description_has_content: bool = False # Whether the input TextArea has non-whitespace text, kept up to date on edits
+        self._input_error_shown: bool = False # Whether the input TextArea currently has the "cannot be empty" error border
 
         # LLM related attributes, only for 'create_plan' mode
         self._llm_worker: Worker | None = None
+        self._llm_planner_import_worker: Worker | None = None # Imports llm_planner in the background, see _import_llm_planner
+        # Incremented for every generation started and every cancel; workers pass the value they were
+        # started with, and results or streamed pieces carrying an older value are dropped.
+        self._dispatch_id: int = 0
         self._llm_call_start_time: float | None = None
         self._loading_timer: Timer | None = None
+        self._loading_prefix: str = "" # Loading message shown before the elapsed time
+        self._spinner_index: int = 0
+        # Streaming: pieces received since the last flush, all pieces shown so far, and the flush timer
+        self._stream_buffer: list[str] = []
+        self._streamed_parts: list[str] = []
+        self._stream_flush_timer: Timer | None = None
         self.repomix_available: bool = False # To track if repomix is available for 'create_plan'
 
         # For planner prompt editing
@@ -65,6 +84,25 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
         self.previous_ui_state_for_prompt_edit: str | None = None # Stores the UI state before switching to prompt edit
         self.prompt_editor_original_text_area_content: str | None = None # Stores text_area content before prompt edit
 
+        # Frequently used widgets, looked up once in on_mount instead of with query_one on every event.
+        # The loading and plan display widgets are created when first shown and stay None until then.
+        self._app_container: Vertical | None = None
+        self._feature_container: Vertical | None = None
+        self._loading_container: Vertical | None = None
+        self._plan_container: Vertical | None = None
+        self._feature_input: TextArea | None = None
+        self._plan_display: TextArea | None = None
+        self._plan_label: Static | None = None
+        self._loading_subtext: Static | None = None
+        self._feature_label: Static | None = None
+        self._plan_options_container: Vertical | None = None
+        self._repomap_radioset: RadioSet | None = None
+        self._multi_feature_checkbox: Checkbox | None = None
+        self._generate_plan_button: Button | None = None
+        self._cancel_initial_button: Button | None = None
+        self._save_prompt_button: Button | None = None
+        self._cancel_prompt_edit_button: Button | None = None
+
 
     def compose(self) -> ComposeResult:
         yield Header()
@@ -79,71 +117,104 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                     soft_wrap=True,
                 )
                 with Horizontal(id="feature_buttons_container", classes="button-container"):
-                    # RadioSet for repomap method (only for 'create_plan' mode)
-                    with RadioSet(id="repomap_method_radioset"): # Visibility handled in on_mount
-                        yield RadioButton("Aider's repomap", id="radio_aider_repomap", value="aider")
-                        yield RadioButton("Repomix like a savage", id="radio_repomix", value="repomix")
+                    # Plan generation options (only for 'create_plan' mode), visibility handled in watch_current_ui_state
+                    with Vertical(id="plan_options_container"):
+                        # RadioSet for repomap method
+                        with RadioSet(id="repomap_method_radioset"):
+                            yield RadioButton("Aider's repomap", id="radio_aider_repomap", value="aider")
+                            yield RadioButton("Repomix like a savage", id="radio_repomix", value="repomix")
+                        yield Checkbox("Multi-feature (---)", id="multi_feature_checkbox")
                     yield Button("Generate Plan", variant="primary", id="generate_plan_button")
                     yield Button("Cancel", variant="error", id="cancel_initial_button")
-                    # Buttons for prompt editing - initially hidden, managed by _set_ui_state
+                    # Buttons for prompt editing - initially hidden, managed by watch_current_ui_state
                     yield Button("Save Prompt", variant="success", id="save_prompt_button", classes="hidden")
                     yield Button("Cancel Prompt Edit", variant="error", id="cancel_prompt_edit_button", classes="hidden")
 
-            # Loading Indicator Area (State 2 - only for 'create_plan' mode)
-            with Vertical(id="loading_container", classes="hidden"):
-                yield LoadingIndicator(id="spinner")
-                yield Static(
-                    "This may take a moment. Press Esc to try and cancel.",
-                    id="loading_subtext"
-                )
-
-            # Plan Display Area (State 3 - only for 'create_plan' mode)
-            with Vertical(id="plan_display_container", classes="hidden"): # Visibility handled in _set_ui_state
-                yield Static("Generated Plan:", classes="label", id="plan_label") # Text updated in on_mount
-                yield TextArea(
-                    id="plan_display_area", # Used for LLM output in 'create_plan'
-                    language="markdown",
-                    show_line_numbers=True,
-                    soft_wrap=True,
-                    read_only=True,
-                )
-                with Horizontal(id="plan_buttons_container", classes="button-container"):
-                    yield Button("Save Plan & Exit", variant="success", id="save_plan_button")
-                    yield Button("Discard & Exit", variant="error", id="discard_plan_button")
-                    yield Static(id="plan_stats_display", classes="hidden") # For LLM stats
+            # The loading (State 2) and plan display (State 3) areas are only used in 'create_plan' mode,
+            # and are mounted into #app-container the first time they are shown, see _ensure_loading_mounted
+            # and _ensure_plan_mounted.
         yield Footer()
 
-    def _set_ui_state(self, new_state: str) -> None:
-        self.current_ui_state = new_state
+    def _ensure_loading_mounted(self) -> Vertical:
+        """Mounts the loading area (spinner, message and elapsed time in one Static) on first use and returns it."""
+        if self._loading_container is None:
+            # The subtext Static is created here, the first time the loading area is shown, and kept in
+            # self._loading_subtext so _update_loading_time can update it on every tick without a DOM query.
+            self._loading_subtext = Static(
+                "This may take a moment. Press Esc to try and cancel.",
+                id="loading_subtext"
+            )
+            self._loading_container = Vertical(
+                self._loading_subtext,
+                id="loading_container"
+            )
+            self._app_container.mount(self._loading_container)
+        return self._loading_container
+
+    def _ensure_plan_mounted(self) -> Vertical:
+        """Mounts the plan display area on first use and returns it."""
+        if self._plan_container is None:
+            self._plan_label = Static("Generated Plan:", classes="label", id="plan_label") # Text updated with the result
+            self._plan_display = TextArea(
+                id="plan_display_area", # Used for LLM output in 'create_plan'
+                language=None, # Markdown highlighting is switched on once the complete plan is in, see _handle_plan_generation_result
+                show_line_numbers=True,
+                soft_wrap=True,
+                read_only=True,
+            )
+            self._plan_container = Vertical(
+                self._plan_label,
+                self._plan_display,
+                Horizontal(
+                    Button("Save Plan & Exit", variant="success", id="save_plan_button"),
+                    Button("Discard & Exit", variant="error", id="discard_plan_button"),
+                    Static(id="plan_stats_display", classes="hidden"), # For LLM stats
+                    id="plan_buttons_container",
+                    classes="button-container"
+                ),
+                id="plan_display_container"
+            )
+            self._app_container.mount(self._plan_container)
+        return self._plan_container
 
+    def watch_current_ui_state(self, new_state: str) -> None:
+        """Shows the containers, buttons and labels for the new UI state."""
         # Main containers visibility
         # Feature input container is visible for input feature and prompt editing
+        # Only write `display` when it changes, so a transition touches at most the containers being swapped
+        # The loading and plan containers are None until first shown
+        if new_state == self.STATE_LOADING_PLAN:
+            self._ensure_loading_mounted()
+        elif new_state == self.STATE_DISPLAY_PLAN:
+            self._ensure_plan_mounted()
         is_feature_input_visible = new_state in [self.STATE_INPUT_FEATURE, self.STATE_EDIT_PLANNER_PROMPT]
-        self.query_one("#feature_input_container").set_class(not is_feature_input_visible, "hidden")
-        self.query_one("#loading_container").set_class(new_state != self.STATE_LOADING_PLAN, "hidden")
-        plan_display_container = self.query_one("#plan_display_container")
-        plan_display_container.set_class(new_state != self.STATE_DISPLAY_PLAN, "hidden")
+        for container, should_display in (
+            (self._feature_container, is_feature_input_visible),
+            (self._loading_container, new_state == self.STATE_LOADING_PLAN),
+            (self._plan_container, new_state == self.STATE_DISPLAY_PLAN),
+        ):
+            if container is not None and container.display != should_display:
+                container.display = should_display
 
         # Reset plan label if not in display state or if it's being hidden
-        plan_label_widget = self.query_one("#plan_label", Static)
-        if new_state != self.STATE_DISPLAY_PLAN:
-            plan_label_widget.update("Generated Plan:") # Reset to default
+        if new_state != self.STATE_DISPLAY_PLAN and self._plan_label is not None:
+            self._plan_label.update("Generated Plan:") # Reset to default
 
         # Elements within #feature_input_container
-        feature_label = self.query_one("#feature_label", Static)
-        repomap_radioset = self.query_one("#repomap_method_radioset", RadioSet)
-        generate_plan_button = self.query_one("#generate_plan_button", Button)
-        cancel_initial_button = self.query_one("#cancel_initial_button", Button)
-        save_prompt_button = self.query_one("#save_prompt_button", Button)
-        cancel_prompt_edit_button = self.query_one("#cancel_prompt_edit_button", Button)
-        text_area_input = self.query_one("#feature_description_input", TextArea)
+        feature_label = self._feature_label
+        plan_options_container = self._plan_options_container
+        generate_plan_button = self._generate_plan_button
+        cancel_initial_button = self._cancel_initial_button
+        save_prompt_button = self._save_prompt_button
+        cancel_prompt_edit_button = self._cancel_prompt_edit_button
+        text_area_input = self._feature_input
 
 
         is_input_feature_state = new_state == self.STATE_INPUT_FEATURE
         is_edit_prompt_state = new_state == self.STATE_EDIT_PLANNER_PROMPT
 
         # Visibility and labels of buttons in feature_buttons_container
-        repomap_radioset.display = is_input_feature_state and self.mode == "create_plan"
+        plan_options_container.display = is_input_feature_state and self.mode == "create_plan"
         generate_plan_button.display = is_input_feature_state
         cancel_initial_button.display = is_input_feature_state
 
@@ -168,7 +239,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
             text_area_input.focus()
         elif new_state == self.STATE_DISPLAY_PLAN: # Only for create_plan mode
             # Plan display area is already read_only by default
-            self.query_one("#plan_display_area", TextArea).focus()
+            self._plan_display.focus()
         elif new_state == self.STATE_LOADING_PLAN:
             text_area_input.read_only = True # Make input read-only while loading
             pass # No specific focus, loading indicator is shown
@@ -206,18 +277,29 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                 print(f"Warning: Failed to set theme '{theme_name_from_config}': {e}. Falling back to default.", file=sys.stderr)
                 self.dark = config.DEFAULT_THEME_NAME == "dark"
 
+        self._app_container = self.query_one("#app-container", Vertical)
+        self._feature_container = self.query_one("#feature_input_container", Vertical)
+        self._feature_input = self.query_one("#feature_description_input", TextArea)
+        self._feature_label = self.query_one("#feature_label", Static)
+        self._plan_options_container = self.query_one("#plan_options_container", Vertical)
+        self._repomap_radioset = self.query_one("#repomap_method_radioset", RadioSet)
+        self._multi_feature_checkbox = self.query_one("#multi_feature_checkbox", Checkbox)
+        self._generate_plan_button = self.query_one("#generate_plan_button", Button)
+        self._cancel_initial_button = self.query_one("#cancel_initial_button", Button)
+        self._save_prompt_button = self.query_one("#save_prompt_button", Button)
+        self._cancel_prompt_edit_button = self.query_one("#cancel_prompt_edit_button", Button)
+
         # Mode-specific UI setup for initial state (STATE_INPUT_FEATURE)
-        feature_desc_input_widget = self.query_one("#feature_description_input", TextArea)
-        repomap_radioset_widget = self.query_one("#repomap_method_radioset", RadioSet)
+        feature_desc_input_widget = self._feature_input
+        repomap_radioset_widget = self._repomap_radioset
 
         if self.mode == "edit_section":
             feature_desc_input_widget.text = self.initial_text or ""
-            # Other elements like button labels and visibility are handled by _set_ui_state
-            self.query_one("#loading_container").display = False # Ensure hidden if starting in edit_section
-            self.query_one("#plan_display_container").display = False # Ensure hidden
+            # Other elements like button labels and visibility are handled by watch_current_ui_state
         else: # create_plan mode (default)
             if self.initial_text: # Allow pre-filling feature description for create_plan mode
                 feature_desc_input_widget.text = self.initial_text
+            import shutil # Only needed in create_plan mode
             repomix_path = shutil.which("repomix")
             self.repomix_available = repomix_path is not None
             radio_repomix_button = self.query_one("#radio_repomix", RadioButton)
@@ -225,8 +307,13 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                 radio_repomix_button.disabled = True
                 radio_repomix_button.label = "Repomix (not found)"
             repomap_radioset_widget.value = "aider"
+            # Importing litellm takes seconds; do it in a thread while the user is typing the description,
+            # instead of on the event loop when Generate Plan is pressed.
+            self._llm_planner_import_worker = self.run_worker(
+                self._import_llm_planner, thread=True, group="llm_planner_import", exit_on_error=False
+            )
 
-        self._set_ui_state(self.STATE_INPUT_FEATURE) # Set initial state and UI elements
+        self.watch_current_ui_state(self.current_ui_state) # Set up UI elements for the initial state (STATE_INPUT_FEATURE)
 
     def watch_theme(self, old_theme: str | None, new_theme: str | None) -> None:
         """Saves the theme when it changes."""
@@ -245,7 +332,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
         if self.current_ui_state == self.STATE_EDIT_PLANNER_PROMPT: # Already in this mode
             return
 
-        text_area = self.query_one("#feature_description_input", TextArea)
+        text_area = self._feature_input
         self.previous_ui_state_for_prompt_edit = self.current_ui_state
         # Save the current content of the text_area before loading the prompt
         self.prompt_editor_original_text_area_content = text_area.text
@@ -278,61 +365,92 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
             prompt_content_to_load = PLAN_GENERATION_PROMPT_TEMPLATE # Fallback to default in case of other errors
 
         text_area.load_text(prompt_content_to_load)
-        self._set_ui_state(self.STATE_EDIT_PLANNER_PROMPT)
+        self.current_ui_state = self.STATE_EDIT_PLANNER_PROMPT
 
 
+    def _show_input_error(self, text_area: TextArea) -> None:
+        """Marks the input TextArea with the "cannot be empty" error border, unless it is already shown."""
+        if self._input_error_shown:
+            return
+        with self.batch_update(): # One repaint for all the style writes
+            text_area.border_title = "Description cannot be empty!"
+            text_area.styles.border_type = "heavy"
+            text_area.styles.border_title_color = "red"
+            text_area.styles.border = ("heavy", "red")
+        self._input_error_shown = True
+
+    def _reset_input_border(self, text_area: TextArea) -> None:
+        """Removes the error border and title set on the input TextArea when the description was empty."""
+        with self.batch_update(): # One repaint for all the style writes
+            text_area.border_title = None
+            text_area.styles.border_type = None
+            text_area.styles.border_title_color = None
+            text_area.styles.border = None
+        self._input_error_shown = False
+
+    def on_text_area_changed(self, event: TextArea.Changed) -> None:
+        """Tracks whether the input TextArea has content, so the Generate Plan check doesn't have to build and strip the text."""
+        if event.text_area is self._feature_input:
+            # Stops at the first line with content, which is usually the first one
+            self._description_has_content = any(line.strip() for line in event.text_area.document.lines)
+
     async def on_button_pressed(self, event: Button.Pressed) -> None:
         button_id = event.button.id
-        description_area = self.query_one("#feature_description_input", TextArea)
+        description_area = self._feature_input
 
         if button_id == "generate_plan_button" and self.current_ui_state == self.STATE_INPUT_FEATURE: # "Generate Plan" or "Save Changes"
             if self.mode == "edit_section":
                 edited_text = description_area.text
                 self.exit(edited_text) # Return the edited text
             else: # create_plan mode
-                description = description_area.text.strip()
-                if not description:
-                    description_area.border_title = "Description cannot be empty!"
-                    description_area.styles.border_type = "heavy"
-                    description_area.styles.border_title_color = "red"
-                    description_area.styles.border = ("heavy", "red")
+                # Validate before building the description or anything for the worker
+                if not self._description_has_content:
+                    self._show_input_error(description_area)
                     return
 
+                description = description_area.text.strip()
                 self.feature_description_content = description # Store original feature description
 
-                # Reset border styles
-                description_area.border_title = None
-                description_area.styles.border_type = None
-                description_area.styles.border_title_color = None
-                description_area.styles.border = None
+                if self._input_error_shown:
+                    self._reset_input_border(description_area)
 
                 # --- Start LLM plan generation (only for create_plan mode) ---
-                # Import generate_plan here to avoid import if not used
-                from .llm_planner import generate_plan
-
                 current_model_name = config.settings.get(config.KEY_LLM_MODEL, "Unknown Model")
-                loading_text_widget = self.query_one("#loading_subtext", Static)
-                loading_text_widget.update(f"Generating plan with {current_model_name}, please wait...")
+                self._ensure_loading_mounted()
+                self._loading_prefix = self.LOADING_MESSAGE_TEMPLATE.format(model_name=current_model_name)
+                self._spinner_index = 0
+                self._loading_subtext.update(f"{self.SPINNER_FRAMES[0]} {self._loading_prefix}")
 
                 self._llm_call_start_time = time.monotonic()
                 if self._loading_timer is not None:
                     self._loading_timer.stop()
-                self._loading_timer = self.set_interval(0.1, self._update_loading_time)
-
-                self._set_ui_state(self.STATE_LOADING_PLAN)
-
-                if self._llm_worker is not None:
-                    await self._llm_worker.cancel()
-
-                selected_repomap_method = self.query_one("#repomap_method_radioset", RadioSet).value
-                bound_call_generate_plan = functools.partial(self._call_generate_plan, description, selected_repomap_method, generate_plan)
-                self._llm_worker = self.run_worker(bound_call_generate_plan, thread=True)
+                # The elapsed time is shown in whole seconds, so ticking faster than 1Hz would only redraw the same text
+                self._loading_timer = self.set_interval(1.0, self._update_loading_time)
+
+                self.current_ui_state = self.STATE_LOADING_PLAN
+
+                selected_repomap_method = self._repomap_radioset.value
+                feature_descriptions = [description]
+                if self._multi_feature_checkbox.value:
+                    feature_descriptions = [
+                        part.strip() for part in description.split(self.MULTI_FEATURE_DELIMITER) if part.strip()
+                    ]
+                self._dispatch_id += 1
+                if len(feature_descriptions) > 1:
+                    generation_coroutine = self._call_generate_plans_async(feature_descriptions, selected_repomap_method, self._dispatch_id)
+                else:
+                    generation_coroutine = self._call_generate_plan_async(description, selected_repomap_method, self._dispatch_id)
+                # Async worker on the app's event loop; exclusive=True cancels any previous generation in the group.
+                self._llm_worker = self.run_worker(generation_coroutine, exclusive=True, group="plan_generation")
                 # --- End LLM plan generation ---
 
         elif button_id == "cancel_initial_button" and self.current_ui_state == self.STATE_INPUT_FEATURE: # "Cancel" or "Discard & Exit"
             self.exit(None) # Exit without returning data
 
         elif button_id == "save_plan_button" and self.current_ui_state == self.STATE_DISPLAY_PLAN: # Only for 'create_plan' mode
+            if self._llm_worker is not None: # The plan is shown while it streams in, but is not complete yet
+                self.notify("The plan is still being generated.", severity="warning", timeout=3)
+                return
             if self.generated_plan_content is not None and self.feature_description_content is not None:
                 self.exit((self.generated_plan_content, self.feature_description_content))
             else:
@@ -354,51 +472,163 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
 
             # Restore previous state and text area content
             if self.previous_ui_state_for_prompt_edit:
-                self._set_ui_state(self.previous_ui_state_for_prompt_edit)
+                self.current_ui_state = self.previous_ui_state_for_prompt_edit
                 if self.prompt_editor_original_text_area_content is not None:
                     description_area.load_text(self.prompt_editor_original_text_area_content)
                 self.previous_ui_state_for_prompt_edit = None
                 self.prompt_editor_original_text_area_content = None
             else: # Fallback if no previous state (should not happen if logic is correct)
-                self._set_ui_state(self.STATE_INPUT_FEATURE) # Default to input feature state
+                self.current_ui_state = self.STATE_INPUT_FEATURE # Default to input feature state
                 description_area.load_text(self.initial_text or "") # Restore initial text or clear
 
         elif button_id == "cancel_prompt_edit_button" and self.current_ui_state == self.STATE_EDIT_PLANNER_PROMPT:
             # Restore previous state and text area content
             if self.previous_ui_state_for_prompt_edit:
-                self._set_ui_state(self.previous_ui_state_for_prompt_edit)
+                self.current_ui_state = self.previous_ui_state_for_prompt_edit
                 if self.prompt_editor_original_text_area_content is not None:
                     description_area.load_text(self.prompt_editor_original_text_area_content)
                 self.previous_ui_state_for_prompt_edit = None
                 self.prompt_editor_original_text_area_content = None
             else: # Fallback
-                self._set_ui_state(self.STATE_INPUT_FEATURE)
+                self.current_ui_state = self.STATE_INPUT_FEATURE
                 description_area.load_text(self.initial_text or "") # Restore initial text or clear
             self.notify("Prompt editing cancelled.", timeout=3)
 
 
-    def _call_generate_plan(self, description: str, repomap_method: str, generate_plan_func) -> None:
+    def _import_llm_planner(self) -> None:
+        """Thread worker started in on_mount: imports llm_planner (and with it litellm) ahead of the first plan request."""
+        from . import llm_planner # noqa: F401
+
+    async def _wait_for_llm_planner_import(self) -> None:
+        """
+        Waits for the background import of llm_planner, so the import statements that follow are instant
+        and never block the event loop. If the background import failed, the caller's own import raises the error.
+        """
+        if self._llm_planner_import_worker is not None:
+            try:
+                await self._llm_planner_import_worker.wait()
+            except Exception:
+                pass
+
+    async def _call_generate_plan_async(self, description: str, repomap_method: str, dispatch_id: int) -> None:
+        """
+        Async worker: awaits agenerate_plan on the app's event loop and updates the UI directly.
+        Only for 'create_plan' mode.
+        """
+        await self._wait_for_llm_planner_import()
+        try:
+            # Import agenerate_plan here to avoid importing litellm if not used
+            from .llm_planner import agenerate_plan
+            # agenerate_plan returns: plan_content, model_name, prompt_tokens, completion_tokens, total_tokens
+            plan_data_result = await agenerate_plan(
+                description, session_name=None, repomap_method=repomap_method,
+                on_chunk=lambda delta: self._on_plan_chunk(delta, dispatch_id)
+            )
+        except asyncio.CancelledError:
+            # Cancelled by Esc, a newer generation or the app exiting; the HTTP request is abandoned
+            # with the task. Stop writing streamed pieces if this generation had started showing them.
+            if dispatch_id == self._dispatch_id:
+                self._stop_plan_stream()
+            raise
+        except Exception as e:
+            plan_data_result = f"# Error During Plan Generation Call\n\nAn unexpected error occurred: {type(e).__name__} - {e}"
+        self._handle_plan_generation_result(plan_data_result, dispatch_id)
+
+    def _on_plan_chunk(self, delta: str, dispatch_id: int) -> None:
+        """
+        Receives a streamed piece of the plan. The first piece switches to the plan display;
+        pieces are then written to the TextArea in batches by _flush_plan_stream.
+        """
+        if dispatch_id != self._dispatch_id: # From a cancelled generation
+            return
+        self._stream_buffer.append(delta)
+        if self.current_ui_state == self.STATE_LOADING_PLAN:
+            if self._loading_timer is not None:
+                self._loading_timer.stop()
+                self._loading_timer = None
+            self._ensure_plan_mounted()
+            if self._plan_display.document.end != (0, 0): # A freshly mounted plan display is already empty
+                self._plan_display.clear()
+            self._streamed_parts.clear()
+            self.current_ui_state = self.STATE_DISPLAY_PLAN
+            self._plan_label.update(self._loading_prefix)
+            # Inserting every token would re-highlight the markdown per token; 50ms batches stay smooth
+            self._stream_flush_timer = self.set_interval(0.05, self._flush_plan_stream)
+
+    def _flush_plan_stream(self) -> None:
+        """Appends the streamed pieces received since the last flush to the plan TextArea."""
+        if self._stream_buffer:
+            text = "".join(self._stream_buffer)
+            self._stream_buffer.clear()
+            self._streamed_parts.append(text)
+            self._plan_display.insert(text, self._plan_display.document.end)
+
+    def _stop_plan_stream(self) -> str | None:
+        """Writes any pending pieces, stops the flush timer and returns the streamed text, or None if nothing was streamed."""
+        if self._stream_flush_timer is None:
+            return None
+        self._stream_flush_timer.stop()
+        self._stream_flush_timer = None
+        self._flush_plan_stream()
+        streamed_text = "".join(self._streamed_parts)
+        self._streamed_parts.clear()
+        return streamed_text
+
+    async def _call_generate_plans_async(self, descriptions: list[str], repomap_method: str, dispatch_id: int) -> None:
         """
-        Synchronous wrapper to call generate_plan_func (passed as arg)
-        and then update UI from thread. Only for 'create_plan' mode.
+        Async worker for multi-feature mode: generates one plan per description concurrently,
+        within the 'max_parallel_llm' and 'llm_requests_per_minute' limits, and shows them as a single document.
+        If any feature fails, the result is an error listing the failures.
         """
+        await self._wait_for_llm_planner_import()
         try:
-            # generate_plan_func now returns: plan_content, model_name, prompt_tokens, completion_tokens, total_tokens
-            plan_data_result = generate_plan_func(description, session_name=None, repomap_method=repomap_method)
-            self.call_from_thread(self._handle_plan_generation_result, plan_data_result)
+            from .llm_planner import agenerate_plans_batch
+            results = await agenerate_plans_batch(descriptions, session_name=None, repomap_method=repomap_method)
+        except asyncio.CancelledError:
+            raise # Cancelled by Esc, a newer generation or the app exiting; the calls are abandoned with the task
         except Exception as e:
-            error_message = f"# Error During Plan Generation Call\n\nAn unexpected error occurred: {type(e).__name__} - {e}"
-            self.call_from_thread(self._handle_plan_generation_result, error_message)
+            self._handle_plan_generation_result(
+                f"# Error During Plan Generation Call\n\nAn unexpected error occurred: {type(e).__name__} - {e}",
+                dispatch_id
+            )
+            return
+
+        failures = []
+        for index, result in enumerate(results, start=1):
+            if isinstance(result, BaseException):
+                failures.append(f"## Feature {index}\n\nAn unexpected error occurred: {type(result).__name__} - {result}")
+            elif isinstance(result, str): # Error string from agenerate_plan
+                failures.append(f"## Feature {index}\n\n{result}")
+        if failures:
+            self._handle_plan_generation_result(
+                f"# Error Generating Plan\n\n{len(failures)} of {len(descriptions)} feature plans failed.\n\n" + "\n\n".join(failures),
+                dispatch_id
+            )
+            return
+
+        # Each plan keeps its own '# Title' and '## Step' headers, so the plans are joined as-is;
+        # extra '##' headings would show up as empty steps in the sidebar.
+        combined_plan = "\n\n".join(result[0] for result in results)
+        def sum_tokens(position: int) -> int | None:
+            counts = [result[position] for result in results]
+            return None if None in counts else sum(counts)
+        self._handle_plan_generation_result(
+            (combined_plan, results[0][1], sum_tokens(2), sum_tokens(3), sum_tokens(4)),
+            dispatch_id
+        )
 
 
-    def _handle_plan_generation_result(self, plan_data: tuple[str, str, int | None, int | None, int | None] | str) -> None:
+    def _handle_plan_generation_result(self, plan_data: tuple[str, str, int | None, int | None, int | None] | str, dispatch_id: int) -> None:
         """
-        Called from worker thread with the result of plan generation.
+        Called by the plan generation worker with the result of plan generation.
         Only for 'create_plan' mode.
         """
+        if dispatch_id != self._dispatch_id: # Generation was cancelled or superseded; drop the late result
+            return
         self._llm_worker = None
-        plan_display_widget = self.query_one("#plan_display_area", TextArea)
-        plan_label_widget = self.query_one("#plan_label", Static)
+        self._ensure_plan_mounted()
+        plan_display_widget = self._plan_display
+        plan_label_widget = self._plan_label
 
         plan_text_to_display = ""
 
@@ -424,37 +654,44 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
             self.generated_plan_content = plan_data
             plan_text_to_display = plan_data
             plan_label_widget.update("Plan Generation Failed")
-            if self._llm_call_start_time is not None: # Still reset timer if it was running
-                self._llm_call_start_time = None
-
-
-        plan_display_widget.load_text(plan_text_to_display)
+            self._llm_call_start_time = None # Still reset timer if it was running
 
         if self._loading_timer is not None:
             self._loading_timer.stop()
             self._loading_timer = None
 
-        self._set_ui_state(self.STATE_DISPLAY_PLAN)
-        # Reset loading subtext for next time
-        self.query_one("#loading_subtext", Static).update("This may take a moment. Press Esc to try and cancel.")
+        # The plan is loaded exactly once, and not at all if streaming already displayed this text
+        # (the final plan is stripped, the streamed text may still have surrounding whitespace).
+        # The loading subtext is not reset here since on_button_pressed rewrites it before the loading area is shown again.
+        streamed_text = self._stop_plan_stream()
+        if streamed_text is None:
+            plan_display_widget.load_text(plan_text_to_display)
+        elif streamed_text.strip() != plan_text_to_display:
+            # Replace the streamed text in place (e.g. with an error that came after a partial stream)
+            # rather than building a new document with load_text.
+            plan_display_widget.replace(plan_text_to_display, (0, 0), plan_display_widget.document.end)
+        # A streamed plan is shown as plain text while it arrives, so the markdown grammar is not
+        # re-run on every batch; highlight the whole document once here instead.
+        if plan_display_widget.language is None:
+            plan_display_widget.language = "markdown"
+        self.current_ui_state = self.STATE_DISPLAY_PLAN
 
     def _update_loading_time(self) -> None:
         """Periodically updates the loading subtext with elapsed time."""
-        if self._llm_call_start_time is not None and self.current_ui_state == self.STATE_LOADING_PLAN: # Use renamed variable
-            elapsed_time = time.monotonic() - self._llm_call_start_time # Use renamed variable
-            current_model_name = config.settings.get(config.KEY_LLM_MODEL, "Unknown Model")
-            loading_text_widget = self.query_one("#loading_subtext", Static)
-            loading_text_widget.update(f"Generating plan with {current_model_name}, please wait... (Elapsed: {elapsed_time:.1f}s)")
+        if self._llm_call_start_time is not None and self.current_ui_state == self.STATE_LOADING_PLAN:
+            elapsed_seconds = int(time.monotonic() - self._llm_call_start_time)
+            self._spinner_index = (self._spinner_index + 1) % len(self.SPINNER_FRAMES)
+            self._loading_subtext.update(f"{self.SPINNER_FRAMES[self._spinner_index]} {self._loading_prefix} (Elapsed: {elapsed_seconds}s)")
 
 
     async def action_request_quit_or_reset(self) -> None:
         """Handles Escape key. Behavior depends on current UI state."""
-        text_area = self.query_one("#feature_description_input", TextArea)
+        text_area = self._feature_input
 
         if self.current_ui_state == self.STATE_EDIT_PLANNER_PROMPT:
             # Cancel prompt editing and return to the previous state
             if self.previous_ui_state_for_prompt_edit:
-                self._set_ui_state(self.previous_ui_state_for_prompt_edit)
+                self.current_ui_state = self.previous_ui_state_for_prompt_edit
                 if self.prompt_editor_original_text_area_content is not None:
                     text_area.load_text(self.prompt_editor_original_text_area_content)
                 # Reset tracking variables
@@ -463,7 +700,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                 self.notify("Prompt editing cancelled. Press Esc again to exit app.", timeout=3)
                 return # Stay in the app, in the restored state
             else: # Fallback if somehow previous_ui_state_for_prompt_edit is None
-                self._set_ui_state(self.STATE_INPUT_FEATURE) # Default to input feature
+                self.current_ui_state = self.STATE_INPUT_FEATURE # Default to input feature
                 text_area.load_text(self.initial_text or "") # Restore initial text or clear
                 self.notify("Prompt editing cancelled. Press Esc again to exit app.", timeout=3)
                 return
@@ -478,20 +715,20 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                 self._loading_timer = None
             self._llm_call_start_time = None
 
+            # Return to the input right away: a result that still arrives is ignored by
+            # _handle_plan_generation_result since its dispatch id is now stale.
+            self._dispatch_id += 1
             if self._llm_worker is not None:
-                await self._llm_worker.cancel()
+                self._llm_worker.cancel()
                 self._llm_worker = None
-                self.query_one("#loading_subtext", Static).update("Cancellation requested... returning to input.")
-                self.set_timer(0.5, lambda: self._set_ui_state(self.STATE_INPUT_FEATURE))
-            else: # Should not happen if worker was supposed to be running
-                self._set_ui_state(self.STATE_INPUT_FEATURE)
+            self.current_ui_state = self.STATE_INPUT_FEATURE
         else: # STATE_INPUT_FEATURE (applies to both 'create_plan' and 'edit_section' modes)
             # Default behavior: exit the app
             self.exit(None)
 
     def _update_text_area_from_external(self, text_content: str | None) -> None:
-        """Called from worker thread to update TextArea and handle cleanup."""
-        text_area = self.query_one("#feature_description_input", TextArea)
+        """Called by the external editor worker to update the TextArea with the edited text."""
+        text_area = self._feature_input
         if text_content is not None:
             # Ensure the text area is editable before trying to load text
             if not text_area.read_only:
@@ -502,19 +739,29 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
         # If text_content is None, an error was already notified by the worker.
         text_area.focus()
 
-    def _run_external_editor_sync(self, editor_cmd: str, current_text: str, temp_file_path: str) -> None:
+    def _run_external_editor_sync(self, editor_cmd: str, current_text: str, temp_fd: int, temp_file_path: str) -> tuple[str | None, list[tuple[str, str, str]]]:
         """
-        Synchronous part: creates temp file, runs the editor, reads back the file, and cleans up.
-        This runs in a worker thread.
+        Synchronous part: writes the text to the temp file through its open descriptor (temp_fd, which is
+        closed here), runs the editor, reads back the file, and cleans up.
+        This runs in a thread (see _run_external_editor), so it does not touch the UI; it returns
+        the edited text (None if it could not be read) and the notifications to show, as
+        (message, title, severity) tuples.
         """
+        # Only needed once the user actually opens the external editor
+        import shlex
+        from . import tmux_utils
+
+        notices: list[tuple[str, str, str]] = []
         try:
-            with open(temp_file_path, "w", encoding="utf-8") as tmpfile_write:
-                tmpfile_write.write(current_text)
+            # Write through the descriptor mkstemp opened rather than reopening the path.
+            # It is closed before the editor starts: many editors save by writing a new file and
+            # renaming it over the path, so the result has to be read back by path, not from this fd.
+            with os.fdopen(temp_fd, "wb") as tmpfile_write:
+                tmpfile_write.write(current_text.encode("utf-8"))
 
             # The command for tmux new-window should be a single string for the shell command part
             # Ensure the temp_file_path is quoted to handle spaces or special characters.
-            quoted_temp_file_path = f"'{temp_file_path.replace("'", "'\\''")}'" # Basic POSIX sh quoting
-            full_editor_command_for_tmux = f"{editor_cmd} {quoted_temp_file_path}"
+            full_editor_command_for_tmux = f"{editor_cmd} {shlex.quote(temp_file_path)}"
 
             # Use the utility function from tmux_utils which now uses `wait-for`
             process = tmux_utils.run_command_in_new_window_and_wait(
@@ -540,7 +787,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                 else:
                     error_message += "\nAttempting to load content from temp file anyway."
 
-                self.call_from_thread(self.notify, error_message, title="Editor Sync Warning", severity="warning", timeout=10)
+                notices.append((error_message, "Editor Sync Warning", "warning"))
 
                 # Try to load content if file exists, even if wait-for failed
                 if temp_file_still_exists:
@@ -549,7 +796,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                             updated_text_content = tmpfile_read.read()
                     except Exception as e_read:
                         read_error_msg = f"Could not read temp file after 'wait-for' error: {e_read}"
-                        self.call_from_thread(self.notify, read_error_msg, title="File Read Error", severity="error", timeout=10)
+                        notices.append((read_error_msg, "File Read Error", "error"))
                         updated_text_content = None # Ensure it's None
                 else:
                     updated_text_content = None # Ensure it's None
@@ -561,7 +808,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                         "'tmux wait-for' succeeded, but the temporary edit file is missing. "
                         "Changes may have been lost."
                     )
-                    self.call_from_thread(self.notify, missing_file_msg, title="Editor Sync Warning", severity="warning", timeout=10)
+                    notices.append((missing_file_msg, "Editor Sync Warning", "warning"))
                     # No content to load, updated_text_content remains None
                 else:
                     try:
@@ -569,20 +816,20 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                             updated_text_content = tmpfile_read.read()
                     except Exception as e_read:
                         read_error_msg = f"Could not read temp file after editor exit: {e_read}"
-                        self.call_from_thread(self.notify, read_error_msg, title="File Read Error", severity="error", timeout=10)
+                        notices.append((read_error_msg, "File Read Error", "error"))
                         # Content could not be read, updated_text_content remains None
 
-            self.call_from_thread(self._update_text_area_from_external, updated_text_content)
+            return updated_text_content, notices
 
         except FileNotFoundError: # For the 'tmux' command itself not being found by subprocess
-            self.call_from_thread(self.notify, "Error: 'tmux' command not found. Is tmux installed and in your PATH?", title="TMUX Error", severity="error", timeout=10)
-            self.call_from_thread(self._update_text_area_from_external, None)
+            notices.append(("Error: 'tmux' command not found. Is tmux installed and in your PATH?", "TMUX Error", "error"))
+            return None, notices
         except RuntimeError as e: # Catch RuntimeError from tmux_utils if new-window fails
-            self.call_from_thread(self.notify, f"Error launching editor via tmux: {e}", title="TMUX Launch Error", severity="error", timeout=10)
-            self.call_from_thread(self._update_text_area_from_external, None)
+            notices.append((f"Error launching editor via tmux: {e}", "TMUX Launch Error", "error"))
+            return None, notices
         except Exception as e: # Catch-all for other unexpected errors during the process
-            self.call_from_thread(self.notify, f"An unexpected error occurred with the external editor: {e}", title="Editor Error", severity="error", timeout=10)
-            self.call_from_thread(self._update_text_area_from_external, None)
+            notices.append((f"An unexpected error occurred with the external editor: {e}", "Editor Error", "error"))
+            return None, notices
         finally:
             # The editor process (due to -W) should have completed before this 'finally' block.
             # It's now safe to attempt removal of the temporary file.
@@ -591,9 +838,17 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
                     os.remove(temp_file_path)
             except OSError:
                 # Optionally notify if deletion fails, but often it's not critical.
-                # self.call_from_thread(self.notify, f"Warning: Could not delete temporary file: {temp_file_path}", severity="warning")
                 pass # Silently attempt removal
 
+    async def _run_external_editor(self, editor_cmd: str, current_text: str, temp_fd: int, temp_file_path: str) -> None:
+        """Async worker: waits for the external editor in a thread, then updates the UI on the event loop."""
+        updated_text_content, notices = await asyncio.to_thread(
+            self._run_external_editor_sync, editor_cmd, current_text, temp_fd, temp_file_path
+        )
+        for message, title, severity in notices:
+            self.notify(message, title=title, severity=severity, timeout=10)
+        self._update_text_area_from_external(updated_text_content)
+
     async def action_open_external_editor(self) -> None:
         """Handles Ctrl+E: Opens content in an external editor via tmux new-window."""
         editor_cmd_str = config.settings.get(config.KEY_TEXT_EDITOR)
@@ -608,7 +863,7 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
             )
             return
 
-        text_area = self.query_one("#feature_description_input", TextArea)
+        text_area = self._feature_input
         if text_area.read_only:
             self.notify("Cannot edit read-only text area with external editor.", severity="warning")
             return
@@ -618,19 +873,19 @@ class FeatureInputApp(App[str | tuple[str, str] | None]):
         try:
             # Create a temporary file that persists until manually deleted by _run_external_editor_sync.
             # Suffix .md is important for editors that rely on extension for syntax highlighting.
-            fd, temp_file_path = tempfile.mkstemp(suffix=".md", text=True)
-            os.close(fd) # Close file descriptor, _run_external_editor_sync will open/write/read/delete.
+            import tempfile # Deferred like the tmux helpers in _run_external_editor_sync
+            fd, temp_file_path = tempfile.mkstemp(suffix=".md")
+            # The descriptor stays open; _run_external_editor_sync writes through it, then reads back and deletes the file.
         except Exception as e:
             self.notify(f"Failed to create temporary file: {e}", title="File Error", severity="error")
             return
 
         self.notify(f"Opening with '{editor_cmd_str}'. Close editor window/tab to return.", title="External Edit", timeout=5)
 
-        # Pass current_text and temp_file_path to the worker.
-        # The worker will write current_text to temp_file_path before launching editor.
+        # Pass current_text and the temp file to the worker.
+        # The worker will write current_text to the temp file before launching editor.
         self.run_worker(
-            functools.partial(self._run_external_editor_sync, editor_cmd_str, current_text, temp_file_path),
-            thread=True,
+            self._run_external_editor(editor_cmd_str, current_text, fd, temp_file_path),
             exclusive=True # Ensure only one external editor instance at a time
         )
 
@@ -640,6 +895,7 @@ if __name__ == "__main__":
     # It primarily tests the "create_plan" mode.
     # For "edit_section" mode, you might run section_editor.py directly.
     import os
+    import re
 
     # Define constants for directory names for testing purposes
     # These are also defined in plan_generator.py; for testing, ensure consistency or pass as args.
@@ -648,6 +904,10 @@ if __name__ == "__main__":
 
     # Helper functions for plan saving (mirrored from plan_generator.py for test purposes)
     # Consider moving these to a shared test utility if used in multiple test scripts.
+    # Slug patterns, precompiled once (same as in plan_generator.py)
+    _SLUG_DROP_RE_TEST = re.compile(r'[^a-z0-9\s\-]')
+    _SLUG_SEPARATOR_RE_TEST = re.compile(r'[\s\-]+')
+
     def _extract_plan_title_for_test(markdown_content: str) -> str:
         """Extracts the plan title from the first H1 header in markdown."""
         lines = markdown_content.splitlines()
@@ -661,11 +921,8 @@ if __name__ == "__main__":
 
     def _sanitize_for_path_for_test(text: str) -> str:
         """Converts a string into a slug suitable for file/directory names."""
-        text = text.lower()
-        text = re.sub(r'\s+', '-', text)
-        text = re.sub(r'[^a-z0-9\-]', '', text)
-        text = re.sub(r'-+', '-', text)
-        text = text.strip('-')
+        text = _SLUG_DROP_RE_TEST.sub('', text.lower())
+        text = _SLUG_SEPARATOR_RE_TEST.sub('-', text).strip('-')
         if not text:
             return "default-plan-title"
         return text
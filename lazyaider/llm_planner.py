@@ -1,60 +1,349 @@
+import asyncio
+import copy
+import functools
+import hashlib
 import litellm
+import logging
 import os
+import re
+import string
 import sys
 import subprocess
+from typing import Callable
 from . import config # Use relative import for config within the same package
+from . import plan_cache
 from .prompt import PLAN_GENERATION_PROMPT_TEMPLATE as DEFAULT_PLAN_GENERATION_PROMPT_TEMPLATE
 from .aider_utils import get_aider_repo_map
 
-def generate_plan(
-    feature_description: str,
-    session_name: str | None = None,
-    repomap_method: str = "aider",
-    prompt_dump_file: str | None = None
-) -> tuple[str, str, int | None, int | None, int | None] | str:
+logger = logging.getLogger(__name__)
+
+LLM_CALL_TIMEOUT_SECONDS = 240
+
+# Stands in for the feature description while the prompt template is formatted (see _prepare_plan_request)
+_FEATURE_DESCRIPTION_MARKER = "\x00feature_description\x00"
+
+# (event loop, plan cache key) -> future of the agenerate_plan call in progress for that request
+_inflight_plans: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+# httpx.AsyncClient installed as litellm.aclient_session when 'llm_http2' is set, and the event loop it belongs to
+_http_client = None
+_http_client_loop: asyncio.AbstractEventLoop | None = None
+
+# litellm.Router over the 'llm_model_list' deployments, and the list it was built from
+_router = None
+_router_model_list: list[dict] | None = None
+
+# litellm provider prefix (as in "openrouter/openai/gpt-4o") -> (API key environment variable, provider name for messages)
+_PROVIDER_API_KEYS = {
+    "openai": ("OPENAI_API_KEY", "OpenAI"),
+    "anthropic": ("ANTHROPIC_API_KEY", "Anthropic"),
+    "openrouter": ("OPENROUTER_API_KEY", "OpenRouter"),
+    "gemini": ("GEMINI_API_KEY", "Gemini"),
+    "azure": ("AZURE_API_KEY", "Azure"),
+    "mistral": ("MISTRAL_API_KEY", "Mistral"),
+    "groq": ("GROQ_API_KEY", "Groq"),
+    "deepseek": ("DEEPSEEK_API_KEY", "DeepSeek"),
+    "cohere": ("COHERE_API_KEY", "Cohere"),
+}
+
+# Model names without a provider prefix that litellm routes by name -> their provider.
+# Bare gemini names are left out on purpose: litellm sends those to Vertex AI, not the Gemini API.
+_BARE_MODEL_PROVIDERS = {
+    "gpt": "openai",
+    "claude": "anthropic",
+    "mistral": "mistral",
+    "codestral": "mistral",
+    "command": "cohere",
+}
+_BARE_MODEL_PROVIDER_RE = re.compile("|".join(_BARE_MODEL_PROVIDERS), re.IGNORECASE)
+
+def _model_provider(model: str) -> str | None:
+    """Returns the provider of a litellm model name: its prefix if it has one, else guessed from well-known model names."""
+    if "/" in model:
+        return model.split("/", 1)[0]
+    match = _BARE_MODEL_PROVIDER_RE.search(model)
+    return _BARE_MODEL_PROVIDERS[match.group().lower()] if match else None
+
+@functools.lru_cache(maxsize=16)
+def _resolve_api_key(model: str, api_key_from_config: str | None) -> str | None:
     """
-    Generates a development plan in Markdown format using an LLM.
-    Uses session-specific prompt override if available, else global, else default.
-    The repository map can be generated by Aider's internal method or by 'repomix --compact'.
-    The model is determined by the 'llm_model' setting in the configuration.
+    Returns the API key to pass to litellm: the configured key if set, else the provider's environment variable.
+    Returns None for providers not listed in _PROVIDER_API_KEYS, leaving litellm to find their credentials.
+    Cached, so the environment lookup (and the missing-key warning) happens once per model.
+    """
+    if api_key_from_config:
+        return api_key_from_config
+    provider = _model_provider(model)
+    if provider not in _PROVIDER_API_KEYS:
+        return None
+    env_var, provider_name = _PROVIDER_API_KEYS[provider]
+    api_key = os.getenv(env_var)
+    if not api_key:
+        # litellm might not give clear errors for a missing key
+        logger.warning(
+            "%s API key not found in config ('%s') or %s environment variable. LLM call to %s model might fail.",
+            provider_name, config.KEY_LLM_API_KEY, env_var, provider_name
+        )
+    return api_key
 
-    Args:
-        feature_description: The user's description of the feature to implement.
+@functools.lru_cache(maxsize=32)
+def _load_prompt_template(path: str, mtime_ns: int) -> str:
+    """
+    Reads a prompt template file. Cached per (path, modification time), so the file is only
+    read again after it changes (e.g. after editing the planner prompt in the TUI).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+@functools.lru_cache(maxsize=32)
+def _compile_prompt_template(template: str) -> tuple[tuple[str, str | None, str, str | None], ...]:
+    """
+    Parses a str.format-style prompt template once into (literal text, field name, format spec, conversion)
+    parts, so repeated requests with the same template skip re-scanning it for fields.
+    Raises ValueError for malformed braces, like str.format.
+    """
+    return tuple(string.Formatter().parse(template))
+
+def _render_prompt_template(template: str, **values: str) -> str:
+    """
+    Equivalent of template.format(**values) using the parsed template from _compile_prompt_template.
+    Raises KeyError for a field not in values (including positional '{}' fields) and ValueError for malformed braces.
+    """
+    rendered_parts = []
+    for literal_text, field_name, format_spec, conversion in _compile_prompt_template(template):
+        rendered_parts.append(literal_text)
+        if field_name is None: # Trailing literal text
+            continue
+        if field_name not in values:
+            raise KeyError(field_name)
+        value = values[field_name]
+        if conversion:
+            value = {"r": repr, "s": str, "a": ascii}[conversion](value)
+        rendered_parts.append(format(value, format_spec) if format_spec else value)
+    return "".join(rendered_parts)
+
+def _can_splice_feature_description(template: str) -> bool:
+    """
+    Whether every field of the template that refers to feature_description is a plain {feature_description},
+    so _FEATURE_DESCRIPTION_MARKER can be formatted in and replaced by the description afterwards.
+    A conversion ('!r'), format spec (':>80') or index/attribute would be applied to the marker instead.
+    Raises ValueError for malformed braces.
+    """
+    for _, field_name, format_spec, conversion in _compile_prompt_template(template):
+        if field_name is None or re.match(r"[^.\[]*", field_name).group() != "feature_description":
+            continue
+        if field_name != "feature_description" or format_spec or conversion:
+            return False
+    return True
+
+def _supports_prompt_caching(model: str) -> bool:
+    """
+    Whether the model's provider needs explicit cache_control markers to cache a prompt prefix.
+    Anthropic models do; OpenAI caches long shared prefixes automatically, so no markers are needed there.
+    """
+    return "claude" in model or model.startswith("anthropic/")
+
+def _get_router():
+    """
+    Returns a litellm.Router over the 'llm_model_list' deployments, or None if that setting is not used.
+    The router load-balances calls across the deployments of a model group and retries failed calls
+    on the others. It is built on first use and rebuilt if the setting changes.
+    """
+    global _router, _router_model_list
+    model_list = config.settings.get(config.KEY_LLM_MODEL_LIST)
+    if not model_list:
+        return None
+    if _router is None or model_list != _router_model_list:
+        _router = litellm.Router(
+            model_list=copy.deepcopy(model_list), # The router adds its own fields to the entries
+            routing_strategy="simple-shuffle",
+            num_retries=config.settings.get(config.KEY_LLM_NUM_RETRIES, config.DEFAULT_LLM_NUM_RETRIES),
+            timeout=LLM_CALL_TIMEOUT_SECONDS
+        )
+        _router_model_list = copy.deepcopy(model_list)
+    return _router
+
+@functools.lru_cache(maxsize=1)
+def _h2_available() -> bool:
+    """Whether the optional 'h2' package needed for HTTP/2 is installed. Warns (once) if it is not."""
+    try:
+        import h2 # noqa: F401
+    except ImportError:
+        logger.warning(
+            "'%s' is set but the 'h2' package is not installed. "
+            "Install it with: pip install \"lazyaider[http2]\". Using HTTP/1.1.",
+            config.KEY_LLM_HTTP2
+        )
+        return False
+    return True
+
+def _ensure_http_client() -> None:
+    """
+    If 'llm_http2' is set, makes litellm send requests through a shared HTTP/2 connection pool,
+    so that concurrent calls (see agenerate_plans_batch) are multiplexed over one connection.
+    litellm uses it for OpenAI-compatible providers. An httpx.AsyncClient can only be used on the
+    event loop it was first used on, so a new one is created for each event loop.
+    Must be called from the event loop thread.
+    """
+    global _http_client, _http_client_loop
+    if not config.settings.get(config.KEY_LLM_HTTP2, config.DEFAULT_LLM_HTTP2):
+        return
+    loop = asyncio.get_running_loop()
+    if _http_client is not None and _http_client_loop is loop:
+        return
+    import httpx # Installed with litellm
+    _http_client = httpx.AsyncClient(
+        http2=_h2_available(),
+        timeout=httpx.Timeout(LLM_CALL_TIMEOUT_SECONDS, connect=10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=300)
+    )
+    _http_client_loop = loop
+    litellm.aclient_session = _http_client
+
+async def _aclose_http_client() -> None:
+    """Closes the shared HTTP client, if it was created on the running event loop (which is about to end)."""
+    global _http_client, _http_client_loop
+    if _http_client is None or _http_client_loop is not asyncio.get_running_loop():
+        return
+    client, _http_client, _http_client_loop = _http_client, None, None
+    if litellm.aclient_session is client:
+        litellm.aclient_session = None
+    await client.aclose()
+
+def _plan_cache_keys(model: str, repomap_method: str, formatted_template: str, feature_description: str) -> tuple[str, str]:
+    """
+    Builds the plan cache keys for a request: the key of the whole request, and the context key
+    (the same with an empty description). formatted_template is the prompt template with the
+    repository map filled in, so a changed template, repository map or model all give new keys.
+    Whitespace-only edits to the description (trailing spaces, blank lines around it) keep the same key.
+    """
+    # The template with the repository map is most of the input; hash it once and finish both keys from a copy
+    context_digest = hashlib.blake2b(digest_size=16)
+    for part in (model, repomap_method, formatted_template):
+        context_digest.update(part.encode("utf-8"))
+        context_digest.update(b"\x00")
+    request_digest = context_digest.copy()
+    normalized_description = "\n".join(line.rstrip() for line in feature_description.strip().splitlines())
+    request_digest.update(normalized_description.encode("utf-8"))
+    request_digest.update(b"\x00")
+    context_digest.update(b"\x00") # The empty description
+    return request_digest.hexdigest(), context_digest.hexdigest()
+
+def _cached_plan_result(cache_key: str, context_key: str, feature_description: str, model: str) -> tuple[str, str, None, None, None] | None:
+    """
+    Looks the request up in the plan cache and, on a miss, the semantic cache (each if enabled),
+    and returns the plan in generate_plan's result format, with no token counts since no tokens were spent.
+    Returns None on a miss.
+    """
+    cached_plan = None
+    if config.settings.get(config.KEY_LLM_CACHE_ENABLED):
+        cached_plan = plan_cache.get(cache_key)
+        cache_stats = plan_cache.stats()
+        if cached_plan is None:
+            logger.info("Plan cache miss (hits: %d, misses: %d).", cache_stats['hits'], cache_stats['misses'])
+        else:
+            logger.info(
+                "Using cached plan for this description and repository map (%s). Plan cache hits: %d, misses: %d.",
+                model, cache_stats['hits'], cache_stats['misses']
+            )
+    if cached_plan is None and config.settings.get(config.KEY_LLM_SEMANTIC_CACHE_ENABLED):
+        from . import semantic_cache # Optional, heavy dependencies; only imported when enabled
+        cached_plan = semantic_cache.lookup(context_key, feature_description)
+    if cached_plan is None:
+        return None
+    return cached_plan, model, None, None, None
+
+def _store_plan_result(cache_key: str, context_key: str, feature_description: str, plan_content: str) -> None:
+    """Stores a successfully generated plan in the enabled caches."""
+    if config.settings.get(config.KEY_LLM_CACHE_ENABLED):
+        plan_cache.put(cache_key, plan_content)
+    if config.settings.get(config.KEY_LLM_SEMANTIC_CACHE_ENABLED):
+        from . import semantic_cache
+        semantic_cache.add(context_key, feature_description, plan_content)
+
+def _feature_description_error(feature_description: str) -> str | None:
+    """Returns an error message if the feature description is empty or longer than 'max_feature_chars'."""
+    if not feature_description or not feature_description.strip():
+        return "Error: The feature description is empty."
+    max_feature_chars = config.settings.get(config.KEY_MAX_FEATURE_CHARS, config.DEFAULT_MAX_FEATURE_CHARS)
+    if max_feature_chars and len(feature_description) > max_feature_chars:
+        return (
+            f"Error: The feature description is {len(feature_description)} characters long, more than "
+            f"'{config.KEY_MAX_FEATURE_CHARS}' ({max_feature_chars}). Shorten it or raise the limit in the config."
+        )
+    return None
+
+def _context_window_error(deployment_models: list[str], messages: list[dict]) -> str | None:
+    """
+    Returns an error message if the prompt is longer than the context window of every model
+    that may serve the request, so an oversized request fails here instead of at the provider.
+    Models litellm has no context size for are assumed to fit.
+    """
+    context_windows = []
+    for deployment_model in deployment_models:
+        model_info = litellm.model_cost.get(deployment_model) or litellm.model_cost.get(deployment_model.split("/", 1)[-1]) or {}
+        if not model_info.get("max_input_tokens"):
+            return None
+        context_windows.append(model_info["max_input_tokens"])
+    try:
+        prompt_tokens = litellm.token_counter(model=deployment_models[0], messages=messages)
+    except Exception: # Counting is only a safeguard; let the provider decide
+        return None
+    if prompt_tokens <= max(context_windows):
+        return None
+    return (
+        f"Error: The prompt is about {prompt_tokens} tokens long, more than the model's context window "
+        f"({max(context_windows)} tokens). Try a shorter feature description or a smaller repository map, "
+        "or choose a model with a larger context window."
+    )
+
+def _prepare_plan_request(
+    feature_description: str,
+    session_name: str | None,
+    repomap_method: str,
+    prompt_dump_file: str | None
+) -> tuple[str, str | None, list[dict], list[str], str, str] | str:
+    """
+    Resolves the model and API key, loads the prompt template and the repository map,
+    and builds the LLM messages for a plan generation request.
+    This does blocking work (file reads, repository map subprocesses).
 
     Returns:
-        On success, a tuple: (plan_content: str, model_name: str, prompt_tokens: int | None, completion_tokens: int | None, total_tokens: int | None).
-        On failure, an error message string.
+        On success, a tuple: (model: str, api_key: str | None, messages: list[dict], deployment_models: list[str],
+        cache_key: str, context_key: str). deployment_models are the litellm models that may serve the request;
+        cache_key identifies the whole request; context_key everything except the feature description.
+        On failure, an error message string (a Markdown document starting with "# Error").
     """
     # Ensure config is loaded. `config.settings` should be available.
     # If config.py hasn't set up `DEFAULT_LLM_MODEL` or if it's missing,
     # litellm might default or error. It's better to ensure a default here too.
     model_from_config = config.settings.get(config.KEY_LLM_MODEL)
     api_key_from_config = config.settings.get(config.KEY_LLM_API_KEY)
-
-    if not model_from_config:
-        # Fallback if 'llm_model' is not in config or is empty.
-        model = config.DEFAULT_LLM_MODEL
-        print(f"Warning: '{config.KEY_LLM_MODEL}' not found or empty in config. Using default: {model}", file=sys.stderr)
+    model_list = config.settings.get(config.KEY_LLM_MODEL_LIST)
+
+    if model_list:
+        # Calls go through a litellm.Router (see _get_router): 'llm_model' names a group of deployments,
+        # each with its own credentials in litellm_params
+        model = model_from_config or model_list[0]["model_name"]
+        deployment_models = [entry["litellm_params"]["model"] for entry in model_list if entry["model_name"] == model]
+        if not deployment_models:
+            error_message = f"Error: '{config.KEY_LLM_MODEL}' ('{model}') does not match the model_name of any entry in '{config.KEY_LLM_MODEL_LIST}'."
+            logger.error("%s", error_message)
+            return f"# Error Generating Plan\n\n{error_message}"
+        api_key_to_use = None
+        use_prompt_caching = all(_supports_prompt_caching(deployment_model) for deployment_model in deployment_models)
     else:
-        model = model_from_config
-
-    # Determine the API key to use
-    api_key_to_use = api_key_from_config
-
-    # Check for API keys if using common providers, as litellm might not give clear errors.
-    # This is a helper and not exhaustive.
-    # Priority: 1. Config file, 2. Environment variable
-    if "gpt" in model:
-        if not api_key_to_use and not os.getenv("OPENAI_API_KEY"):
-            print("Warning: OpenAI API key not found in config ('llm_api_key') or OPENAI_API_KEY environment variable. LLM call to OpenAI model might fail.", file=sys.stderr)
-        elif not api_key_to_use: # Use env var if config key is not set
-            api_key_to_use = os.getenv("OPENAI_API_KEY")
-    elif "claude" in model:
-        if not api_key_to_use and not os.getenv("ANTHROPIC_API_KEY"):
-            print("Warning: Anthropic API key not found in config ('llm_api_key') or ANTHROPIC_API_KEY environment variable. LLM call to Anthropic model might fail.", file=sys.stderr)
-        elif not api_key_to_use: # Use env var if config key is not set
-            api_key_to_use = os.getenv("ANTHROPIC_API_KEY")
-    # Add more checks for other providers as needed, following the same pattern
+        if not model_from_config:
+            # Fallback if 'llm_model' is not in config or is empty.
+            model = config.DEFAULT_LLM_MODEL
+            logger.warning("'%s' not found or empty in config. Using default: %s", config.KEY_LLM_MODEL, model)
+        else:
+            model = model_from_config
+
+        # Priority: 1. Config file, 2. Environment variable
+        api_key_to_use = _resolve_api_key(model, api_key_from_config)
+        deployment_models = [model]
+        use_prompt_caching = _supports_prompt_caching(model)
 
     actual_prompt_template = DEFAULT_PLAN_GENERATION_PROMPT_TEMPLATE
     prompt_source_description = "default built-in template"
@@ -81,25 +370,25 @@ def generate_plan(
     if prompt_file_to_load:
         try:
             if prompt_file_to_load.strip(): # Ensure path is not empty
-                with open(prompt_file_to_load, 'r', encoding='utf-8') as f:
-                    actual_prompt_template = f.read()
-                print(f"Using prompt template from: {prompt_source_description}", file=sys.stderr)
+                prompt_file_mtime_ns = os.stat(prompt_file_to_load).st_mtime_ns
+                actual_prompt_template = _load_prompt_template(prompt_file_to_load, prompt_file_mtime_ns)
+                logger.info("Using prompt template from: %s", prompt_source_description)
                 using_custom_prompt = True
                 loaded_prompt_path = prompt_file_to_load
             else:
-                print(f"Info: Prompt override path from {prompt_source_description} is empty. Using default template.", file=sys.stderr)
+                logger.info("Prompt override path from %s is empty. Using default template.", prompt_source_description)
         except FileNotFoundError:
-            print(f"Warning: Prompt template file not found at {prompt_file_to_load} (source: {prompt_source_description}). Using default template.", file=sys.stderr)
+            logger.warning("Prompt template file not found at %s (source: %s). Using default template.", prompt_file_to_load, prompt_source_description)
         except Exception as e:
-            print(f"Warning: Could not load prompt template from {prompt_file_to_load} (source: {prompt_source_description}): {e}. Using default template.", file=sys.stderr)
+            logger.warning("Could not load prompt template from %s (source: %s): %s. Using default template.", prompt_file_to_load, prompt_source_description, e)
     else:
-        print(f"Using {prompt_source_description}.", file=sys.stderr)
+        logger.info("Using %s.", prompt_source_description)
 
 
     # Get the repository map based on the selected method
     repository_map_content = ""
     if repomap_method == "repomix":
-        print("Fetching repository map using 'repomix --compress --stdout'...", file=sys.stderr)
+        logger.info("Fetching repository map using 'repomix --compress --stdout'...")
         try:
             process = subprocess.run(
                 ["repomix", "--compress", "--stdout"],
@@ -112,122 +401,366 @@ def generate_plan(
                 repository_map_content = process.stdout.strip()
                 if not repository_map_content: # Handle empty output from repomix
                     repository_map_content = "Error: 'repomix --compress --stdout' produced no output."
-                    print(f"Warning: {repository_map_content}", file=sys.stderr)
+                    logger.warning("%s", repository_map_content)
                 else:
-                    print("Successfully fetched repository map with repomix.", file=sys.stderr)
+                    logger.info("Successfully fetched repository map with repomix.")
             else:
                 error_output = process.stderr.strip() if process.stderr else "No stderr output."
                 repository_map_content = f"Error: 'repomix --compress --stdout' failed with return code {process.returncode}. Stderr: {error_output}"
-                print(f"Warning: {repository_map_content}", file=sys.stderr)
+                logger.warning("%s", repository_map_content)
         except FileNotFoundError:
             repository_map_content = "Error: 'repomix' command not found. Please ensure it is installed and in your PATH."
-            print(f"Warning: {repository_map_content}", file=sys.stderr)
+            logger.warning("%s", repository_map_content)
         except subprocess.TimeoutExpired:
             repository_map_content = "Error: 'repomix --compress --stdout' timed out after 60 seconds."
-            print(f"Warning: {repository_map_content}", file=sys.stderr)
+            logger.warning("%s", repository_map_content)
         except Exception as e:
             repository_map_content = f"An unexpected error occurred while running 'repomix --compress --stdout': {type(e).__name__} - {e}"
-            print(f"Warning: {repository_map_content}", file=sys.stderr)
+            logger.warning("%s", repository_map_content)
     else: # Default to "aider" or if repomap_method is unknown
         if repomap_method != "aider":
-            print(f"Warning: Unknown repomap_method '{repomap_method}'. Defaulting to Aider's repomap.", file=sys.stderr)
-        print("Fetching repository map using Aider's built-in method...", file=sys.stderr)
+            logger.warning("Unknown repomap_method '%s'. Defaulting to Aider's repomap.", repomap_method)
+        logger.info("Fetching repository map using Aider's built-in method...")
         repository_map_content = get_aider_repo_map()
         if repository_map_content.startswith("Error:") or repository_map_content.startswith("An unexpected error occurred:"):
-            print(f"Warning: Failed to get repository map using Aider's method: {repository_map_content}", file=sys.stderr)
+            logger.warning("Failed to get repository map using Aider's method: %s", repository_map_content)
         else:
-            print("Successfully fetched repository map using Aider's method.", file=sys.stderr)
+            logger.info("Successfully fetched repository map using Aider's method.")
 
     try:
-        prompt = actual_prompt_template.format(
-            feature_description=feature_description,
-            repository_map=repository_map_content
-        )
-    except KeyError as e:
-        # This happens if the prompt template is missing a required placeholder
-        error_message = f"Error: The prompt template is missing a required placeholder. Offending key: {e}."
-        error_message += " Expected placeholders are typically {feature_description} and {repository_map}."
+        if _can_splice_feature_description(actual_prompt_template):
+            # The description is formatted in as a placeholder and spliced back in afterwards, so the
+            # prompt can be split into the part before the description (instructions and repository map,
+            # identical across requests for the same repository) and the part after it.
+            formatted_template = _render_prompt_template(
+                actual_prompt_template,
+                feature_description=_FEATURE_DESCRIPTION_MARKER,
+                repository_map=repository_map_content
+            )
+        else:
+            # The template transforms the description (e.g. {feature_description!r}), so format it in
+            # directly; the prompt is then sent without a cacheable prefix
+            formatted_template = actual_prompt_template.format(
+                feature_description=feature_description,
+                repository_map=repository_map_content
+            )
+    except (KeyError, IndexError, ValueError) as e:
+        if isinstance(e, (KeyError, IndexError)):
+            # This happens if the prompt template is missing a required placeholder
+            error_message = f"Error: The prompt template is missing a required placeholder. Offending key: {e}."
+            error_message += " Expected placeholders are typically {feature_description} and {repository_map}."
+        else:
+            # A lone '{' or '}' (literal braces must be doubled: '{{' and '}}')
+            error_message = f"Error: The prompt template has malformed braces: {e}."
+            error_message += " Literal braces must be written as {{ and }}."
         if using_custom_prompt and loaded_prompt_path:
             error_message += f" Please check the custom prompt file: {loaded_prompt_path}"
         elif using_custom_prompt: # Custom prompt was used but path somehow not set (should not happen)
              error_message += " Please check the custom prompt file."
         else:
             error_message += " This might be an issue with the default prompt template."
-        print(error_message, file=sys.stderr)
+        logger.error("%s", error_message)
         return f"# Error Generating Plan\n\n{error_message}"
 
+    prompt_prefix, marker, prompt_suffix = formatted_template.partition(_FEATURE_DESCRIPTION_MARKER)
+    if marker: # No marker means the description isn't spliced in (no plain placeholder) and the prefix is the whole prompt
+        prompt_suffix = feature_description + prompt_suffix.replace(_FEATURE_DESCRIPTION_MARKER, feature_description)
+    prompt = prompt_prefix + prompt_suffix
+
     if prompt_dump_file:
         try:
             with open(prompt_dump_file, "w", encoding="utf-8") as f:
                 f.write(prompt)
-            print(f"LLM prompt saved to: {prompt_dump_file}", file=sys.stderr)
+            logger.info("LLM prompt saved to: %s", prompt_dump_file)
         except IOError as e:
-            print(f"Warning: Could not write prompt to {prompt_dump_file}: {e}", file=sys.stderr)
+            logger.warning("Could not write prompt to %s: %s", prompt_dump_file, e)
             # Continue with plan generation even if prompt saving fails
 
-    messages = [{"role": "user", "content": prompt}]
-
-    try:
-        print(f"Attempting to call LLM model: {model}...", file=sys.stderr)
-        # Set a timeout for the API call (e.g., 120 seconds)
-        response = litellm.completion(
-            model=model,
-            messages=messages,
-            api_key=api_key_to_use, # Pass the API key to litellm
-            timeout=240 # seconds
-        )
-        # Accessing content according to litellm's current typical response structure
-        if response.choices and response.choices[0].message and response.choices[0].message.content:
-            plan_content = response.choices[0].message.content.strip()
-
-            prompt_tokens: int | None = None
-            completion_tokens: int | None = None
-            total_tokens: int | None = None
-
-            if response.usage:
-                if hasattr(response.usage, 'prompt_tokens'):
-                    prompt_tokens = response.usage.prompt_tokens
-                if hasattr(response.usage, 'completion_tokens'):
-                    completion_tokens = response.usage.completion_tokens
-                if hasattr(response.usage, 'total_tokens'):
-                    total_tokens = response.usage.total_tokens
-            
-            # Log to stderr for debugging/logging
-            token_log_msg = (
-                f"Input: {prompt_tokens if prompt_tokens is not None else 'N/A'}, "
-                f"Output: {completion_tokens if completion_tokens is not None else 'N/A'}, "
-                f"Total: {total_tokens if total_tokens is not None else 'N/A'} tokens."
-            )
-            print(f"LLM ({model}) response received. Usage: {token_log_msg}", file=sys.stderr)
+    if use_prompt_caching and prompt_prefix and prompt_suffix:
+        # Mark the instructions + repository map prefix as cacheable, so repeated requests against
+        # the same repository only pay full input cost (and latency) for the description.
+        messages = [{"role": "user", "content": [
+            {"type": "text", "text": prompt_prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt_suffix},
+        ]}]
+    else:
+        messages = [{"role": "user", "content": prompt}]
 
-            return plan_content, model, prompt_tokens, completion_tokens, total_tokens
-        else:
-            error_message = "Error: LLM response structure was unexpected or content was empty."
-            print(error_message, file=sys.stderr)
-            if response:
-                print(f"Full response object: {response}", file=sys.stderr)
-            return f"# Error Generating Plan\n\n{error_message}\n\nReview LLM provider logs and ensure the model is accessible and configured correctly."
+    cache_key, context_key = _plan_cache_keys(model, repomap_method, formatted_template, feature_description)
+    return model, api_key_to_use, messages, deployment_models, cache_key, context_key
 
-    except litellm.exceptions.APIConnectionError as e:
+def _plan_result_from_response(response, model: str) -> tuple[str, str, int | None, int | None, int | None] | str:
+    """
+    Extracts the plan content and token usage from a litellm completion response.
+    Returns the same value as generate_plan.
+    """
+    # Accessing content according to litellm's current typical response structure
+    if response and response.choices and response.choices[0].message and response.choices[0].message.content:
+        plan_content = response.choices[0].message.content.strip()
+
+        prompt_tokens: int | None = None
+        completion_tokens: int | None = None
+        total_tokens: int | None = None
+
+        if response.usage:
+            if hasattr(response.usage, 'prompt_tokens'):
+                prompt_tokens = response.usage.prompt_tokens
+            if hasattr(response.usage, 'completion_tokens'):
+                completion_tokens = response.usage.completion_tokens
+            if hasattr(response.usage, 'total_tokens'):
+                total_tokens = response.usage.total_tokens
+        
+        # Log to stderr for debugging/logging
+        token_log_msg = (
+            f"Input: {prompt_tokens if prompt_tokens is not None else 'N/A'}, "
+            f"Output: {completion_tokens if completion_tokens is not None else 'N/A'}, "
+            f"Total: {total_tokens if total_tokens is not None else 'N/A'} tokens."
+        )
+        if response.usage:
+            # Provider-side prompt caching (see the cache_control block in _prepare_plan_request):
+            # OpenAI reports cached_tokens; Anthropic reports cache reads and writes separately.
+            prompt_tokens_details = getattr(response.usage, 'prompt_tokens_details', None)
+            cached_tokens = getattr(prompt_tokens_details, 'cached_tokens', None)
+            cache_read_tokens = getattr(response.usage, 'cache_read_input_tokens', None)
+            cache_creation_tokens = getattr(response.usage, 'cache_creation_input_tokens', None)
+            if cache_read_tokens or cache_creation_tokens:
+                token_log_msg += f" Prompt cache: {cache_read_tokens or 0} read, {cache_creation_tokens or 0} written."
+            elif cached_tokens:
+                token_log_msg += f" Prompt cache: {cached_tokens} cached."
+        logger.info("LLM (%s) response received. Usage: %s", model, token_log_msg)
+
+        return plan_content, model, prompt_tokens, completion_tokens, total_tokens
+    else:
+        error_message = "Error: LLM response structure was unexpected or content was empty."
+        logger.error("%s", error_message)
+        if response:
+            logger.error("Full response object: %s", response)
+        return f"# Error Generating Plan\n\n{error_message}\n\nReview LLM provider logs and ensure the model is accessible and configured correctly."
+
+def _plan_error_from_exception(e: Exception, model: str) -> str:
+    """Converts an exception raised by the litellm call into the error message string returned by generate_plan."""
+    if isinstance(e, litellm.exceptions.APIConnectionError):
         error_message = f"Error connecting to LLM API ({model}): {e}"
-        print(error_message, file=sys.stderr)
+        logger.error("%s", error_message)
         return f"# Error Generating Plan\n\n{error_message}\n\nPlease check your network connection and API key."
-    except litellm.exceptions.Timeout as e:
-        error_message = f"LLM API call timed out ({model}): {e}"
-        print(error_message, file=sys.stderr)
+    if isinstance(e, (litellm.exceptions.Timeout, asyncio.TimeoutError)):
+        error_message = f"LLM API call timed out ({model}): {str(e) or f'no complete response after {LLM_CALL_TIMEOUT_SECONDS}s'}"
+        logger.error("%s", error_message)
         return f"# Error Generating Plan\n\n{error_message}\n\nThe model took too long to respond. You might try a different model or check the LLM provider status."
-    except litellm.exceptions.APIError as e: # Catch more specific litellm API errors
+    if isinstance(e, litellm.exceptions.RateLimitError):
+        error_message = f"LLM API rate limit exceeded ({model}): {e}"
+        logger.error("%s", error_message)
+        return f"# Error Generating Plan\n\n{error_message}\n\nThe request was retried without success. Wait a moment before trying again, or raise '{config.KEY_LLM_NUM_RETRIES}' in the config."
+    if isinstance(e, litellm.exceptions.APIError): # Catch more specific litellm API errors
         error_message = f"LLM API error ({model}): {e.status_code} - {e.message}"
-        print(error_message, file=sys.stderr)
+        logger.error("%s", error_message)
         return f"# Error Generating Plan\n\n{error_message}\n\nPlease check your API key, model name, and provider quotas."
+    # Catch-all for other unexpected errors during the litellm call
+    error_message = f"An unexpected error occurred while calling LLM ({model}): {type(e).__name__} - {e}"
+    logger.error("%s", error_message, exc_info=e) # Include traceback for unexpected errors for better debugging
+    return f"# Error Generating Plan\n\n{error_message}"
+
+def generate_plan(
+    feature_description: str,
+    session_name: str | None = None,
+    repomap_method: str = "aider",
+    prompt_dump_file: str | None = None
+) -> tuple[str, str, int | None, int | None, int | None] | str:
+    """
+    Generates a development plan in Markdown format using an LLM.
+    Uses session-specific prompt override if available, else global, else default.
+    The repository map can be generated by Aider's internal method or by 'repomix --compact'.
+    The model is determined by the 'llm_model' setting in the configuration.
+    Successful plans are cached (see plan_cache and semantic_cache, and the 'llm_cache_*' settings in
+    the config); a cache hit returns None for the token counts.
+
+    Args:
+        feature_description: The user's description of the feature to implement.
+
+    Returns:
+        On success, a tuple: (plan_content: str, model_name: str, prompt_tokens: int | None, completion_tokens: int | None, total_tokens: int | None).
+        On failure, an error message string.
+    """
+    # A thin wrapper: the request is made by agenerate_plan (litellm.acompletion) on a private event loop,
+    # so the sync and async paths share one implementation. Not usable from inside a running event loop;
+    # await agenerate_plan there instead.
+    async def run() -> tuple[str, str, int | None, int | None, int | None] | str:
+        try:
+            return await agenerate_plan(feature_description, session_name, repomap_method, prompt_dump_file)
+        finally:
+            await _aclose_http_client() # Its connections can't outlive the event loop
+    return asyncio.run(run())
+
+async def _astream_completion(acompletion: Callable, call_kwargs: dict, on_chunk: Callable[[str], None]):
+    """
+    Streams a completion made with acompletion (litellm's or a router's), passing each content delta
+    to on_chunk, and returns the response rebuilt from the chunks (content and token usage),
+    or None if nothing was received.
+    """
+    stream = await acompletion(**call_kwargs, stream=True)
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk)
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                on_chunk(delta)
+    return litellm.stream_chunk_builder(chunks, messages=call_kwargs["messages"]) if chunks else None
+
+async def agenerate_plan(
+    feature_description: str,
+    session_name: str | None = None,
+    repomap_method: str = "aider",
+    prompt_dump_file: str | None = None,
+    on_chunk: Callable[[str], None] | None = None
+) -> tuple[str, str, int | None, int | None, int | None] | str:
+    """
+    Async version of generate_plan, with the same arguments and return value (generate_plan runs this).
+    The prompt and repository map are prepared in a worker thread since that involves subprocesses;
+    the LLM call itself is awaited with litellm.acompletion, so cancelling the awaiting task
+    also abandons the in-flight HTTP request.
+
+    If on_chunk is given, the response is streamed and on_chunk is called with each piece of
+    the plan text as it arrives. The return value is still the complete plan.
+    A plan served from the plan cache, or shared with an identical request already in progress,
+    is returned without calling on_chunk.
+    """
+    # Reject unusable input before paying for the repository map and an LLM call
+    description_error = _feature_description_error(feature_description)
+    if description_error:
+        logger.error("%s", description_error)
+        return f"# Error Generating Plan\n\n{description_error}"
+
+    request = await asyncio.to_thread(_prepare_plan_request, feature_description, session_name, repomap_method, prompt_dump_file)
+    if isinstance(request, str):
+        return request
+    model, api_key_to_use, messages, deployment_models, cache_key, context_key = request
+
+    # Identical requests already in flight on this event loop (a double-click, two sessions sharing
+    # a prompt, duplicates in a batch) wait for that call's result instead of paying for another one
+    inflight_key = (asyncio.get_running_loop(), cache_key)
+    while True:
+        leader = _inflight_plans.get(inflight_key)
+        if leader is None:
+            break
+        logger.info("An identical plan request is already in progress (%s). Waiting for its result.", model)
+        try:
+            return await asyncio.shield(leader) # Cancelling this caller must not cancel the shared call
+        except asyncio.CancelledError:
+            current_task = asyncio.current_task()
+            if not leader.cancelled() or (hasattr(current_task, "cancelling") and current_task.cancelling()):
+                raise # This caller itself was cancelled
+            # The shared call was cancelled (or failed) by its own caller: make the call ourselves,
+            # or wait for whichever other waiting caller got to it first
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight_plans[inflight_key] = future
+    try:
+        result = await _arequest_plan(
+            feature_description, model, api_key_to_use, messages, deployment_models, cache_key, context_key, on_chunk
+        )
+        future.set_result(result)
+        return result
+    finally:
+        # Only the caller that made the call (and registered the future) removes it
+        if _inflight_plans.get(inflight_key) is future:
+            del _inflight_plans[inflight_key]
+        if not future.done(): # This call was cancelled or failed: the waiting callers retry on their own
+            future.cancel()
+
+async def _arequest_plan(
+    feature_description: str,
+    model: str,
+    api_key_to_use: str | None,
+    messages: list[dict],
+    deployment_models: list[str],
+    cache_key: str,
+    context_key: str,
+    on_chunk: Callable[[str], None] | None
+) -> tuple[str, str, int | None, int | None, int | None] | str:
+    """Returns the cached plan for the prepared request, or calls the LLM and caches the result."""
+    cached_result = await asyncio.to_thread(_cached_plan_result, cache_key, context_key, feature_description, model)
+    if cached_result is not None:
+        return cached_result
+
+    # Only checked on a cache miss: counting the prompt's tokens means tokenizing the whole repository map
+    context_window_error = await asyncio.to_thread(_context_window_error, deployment_models, messages)
+    if context_window_error:
+        logger.error("%s", context_window_error)
+        return f"# Error Generating Plan\n\n{context_window_error}"
+
+    num_retries = config.settings.get(config.KEY_LLM_NUM_RETRIES, config.DEFAULT_LLM_NUM_RETRIES)
+    _ensure_http_client()
+    call_kwargs = {
+        "model": model,
+        "messages": messages,
+        "timeout": LLM_CALL_TIMEOUT_SECONDS,
+        "num_retries": num_retries, # litellm retries transient errors (rate limits, timeouts, 5xx) with backoff
+    }
+    try:
+        router = _get_router()
+        if router is not None:
+            acompletion = router.acompletion # The deployments carry their own API keys
+        else:
+            acompletion = litellm.acompletion
+            call_kwargs["api_key"] = api_key_to_use # Pass the API key to litellm
+        logger.info("Attempting to call LLM model: %s...", model)
+        if on_chunk is None:
+            response = await acompletion(**call_kwargs)
+        else:
+            # litellm's timeout only bounds each network read of a stream, so the whole
+            # streamed response gets the same overall deadline as a regular call.
+            response = await asyncio.wait_for(
+                _astream_completion(acompletion, call_kwargs, on_chunk),
+                timeout=LLM_CALL_TIMEOUT_SECONDS
+            )
     except Exception as e:
-        # Catch-all for other unexpected errors during the litellm call
-        error_message = f"An unexpected error occurred while calling LLM ({model}): {type(e).__name__} - {e}"
-        print(error_message, file=sys.stderr)
-        # Include traceback for unexpected errors for better debugging
-        import traceback
-        traceback.print_exc(file=sys.stderr)
-        return f"# Error Generating Plan\n\n{error_message}"
+        return _plan_error_from_exception(e, model)
+    result = _plan_result_from_response(response, model)
+    if isinstance(result, tuple):
+        await asyncio.to_thread(_store_plan_result, cache_key, context_key, feature_description, result[0])
+    return result
+
+async def agenerate_plans_batch(
+    feature_descriptions: list[str],
+    session_name: str | None = None,
+    repomap_method: str = "aider",
+    max_concurrency: int | None = None,
+    requests_per_minute: int | None = None
+) -> list[tuple[str, str, int | None, int | None, int | None] | str | BaseException]:
+    """
+    Generates one plan per feature description concurrently with agenerate_plan.
+    At most max_concurrency LLM calls are in flight, and if requests_per_minute is set, calls are
+    started no faster than that rate. Both default to the 'max_parallel_llm' and
+    'llm_requests_per_minute' settings.
+
+    Returns:
+        One result per description, in order: agenerate_plan's return value, or the exception it raised.
+    """
+    if max_concurrency is None:
+        max_concurrency = config.settings.get(config.KEY_MAX_PARALLEL_LLM, config.DEFAULT_MAX_PARALLEL_LLM)
+    if requests_per_minute is None:
+        requests_per_minute = config.settings.get(config.KEY_LLM_REQUESTS_PER_MINUTE)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    start_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+    next_start_time = 0.0 # Event loop time at which the next call may start
+
+    async def wait_for_start_slot() -> None:
+        # Reserves the next start time synchronously (no await in between), so concurrent callers get distinct slots
+        nonlocal next_start_time
+        now = asyncio.get_running_loop().time()
+        start_time = max(now, next_start_time)
+        next_start_time = start_time + start_interval
+        if start_time > now:
+            await asyncio.sleep(start_time - now)
+
+    async def generate_one(feature_description: str):
+        async with semaphore:
+            if start_interval:
+                await wait_for_start_slot()
+            return await agenerate_plan(feature_description, session_name=session_name, repomap_method=repomap_method)
+
+    return await asyncio.gather(*(generate_one(d) for d in feature_descriptions), return_exceptions=True)
 
 if __name__ == '__main__':
     # This part is for testing the module directly.
@@ -235,6 +768,7 @@ if __name__ == '__main__':
     # You might need to run this from the project root or adjust PYTHONPATH.
     # Example: python -m lazyaider.llm_planner
 
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     print("Testing LLM Planner Module...")
     # Ensure API key is set for the default or configured model
     # For example, for OpenAI, set OPENAI_API_KEY.
@@ -0,0 +1,100 @@
+"""
+Cache of generated plans.
+
+Plans are kept in memory for the life of the process and in a small SQLite database under
+the user's cache directory, keyed by a hash of everything that went into the LLM request
+(see llm_planner._plan_cache_keys), so that generating a plan again for the same description
+against an unchanged repository map returns the previous result instantly instead of paying
+for another LLM call. Entries expire after the configured 'llm_cache_ttl' seconds.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from . import config
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "lazyaider")
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "plans.sqlite")
+
+_connection: sqlite3.Connection | None = None
+_connection_failed = False # Set once opening the database failed, so we don't retry (and warn) on every call
+_memory: dict[str, tuple[str, int]] = {} # key -> (plan, timestamp); checked before the database
+_hits = 0
+_misses = 0
+_lock = threading.Lock() # get/put are called from worker threads as well as the event loop thread
+
+def _ttl_seconds() -> int:
+    """The configured lifetime of a cache entry, in seconds."""
+    return config.settings.get(config.KEY_LLM_CACHE_TTL, config.DEFAULT_LLM_CACHE_TTL)
+
+def _get_connection() -> sqlite3.Connection | None:
+    """Opens the cache database on first use and drops expired entries. Must be called with _lock held."""
+    global _connection, _connection_failed
+    if _connection is not None or _connection_failed:
+        return _connection
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        connection = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+        connection.execute("CREATE TABLE IF NOT EXISTS plans (hash TEXT PRIMARY KEY, payload BLOB, ts INTEGER)")
+        connection.execute("DELETE FROM plans WHERE ts < ?", (int(time.time()) - _ttl_seconds(),))
+        connection.commit()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Could not open plan cache at %s: %s. Plans will only be cached in memory.", CACHE_DB_PATH, e)
+        _connection_failed = True
+        return None
+    _connection = connection
+    return _connection
+
+def get(key: str) -> str | None:
+    """Returns the cached plan for key, or None if there is no unexpired entry."""
+    global _hits, _misses
+    oldest_valid_ts = int(time.time()) - _ttl_seconds()
+    with _lock:
+        plan = None
+        cached = _memory.get(key)
+        if cached is not None and cached[1] >= oldest_valid_ts:
+            plan = cached[0]
+        else:
+            connection = _get_connection()
+            if connection is not None:
+                try:
+                    row = connection.execute(
+                        "SELECT payload, ts FROM plans WHERE hash = ? AND ts >= ?",
+                        (key, oldest_valid_ts)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning("Could not read from plan cache: %s", e)
+                    row = None
+                if row:
+                    plan = row[0].decode("utf-8")
+                    _memory[key] = (plan, row[1])
+        if plan is None:
+            _misses += 1
+        else:
+            _hits += 1
+    return plan
+
+def put(key: str, value: str) -> None:
+    """Stores value as the cached plan for key, replacing any previous entry."""
+    now = int(time.time())
+    with _lock:
+        _memory[key] = (value, now)
+        connection = _get_connection()
+        if connection is None:
+            return
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO plans (hash, payload, ts) VALUES (?, ?, ?)",
+                (key, value.encode("utf-8"), now)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("Could not write to plan cache: %s", e)
+
+def stats() -> dict[str, int]:
+    """Returns the number of cache hits and misses in this process."""
+    with _lock:
+        return {"hits": _hits, "misses": _misses}
@@ -1,6 +1,7 @@
 import sys
 import os
 import re
+import logging
 import argparse # Added for CLI argument parsing
 from .feature_input_app import FeatureInputApp # Changed to relative import
 from .llm_planner import generate_plan # Changed to relative import
@@ -9,6 +10,9 @@ from .llm_planner import generate_plan # Changed to relative import
 lazyaider_DIR_NAME = ".lazyaider"
 PLANS_SUBDIR_NAME = "plans"
 
+_SLUG_DROP_RE = re.compile(r'[^a-z0-9\s\-]') # Everything except lowercase letters, digits, whitespace and hyphens
+_SLUG_SEPARATOR_RE = re.compile(r'[\s\-]+') # Runs of whitespace and hyphens, each becoming a single hyphen
+
 def _extract_plan_title(markdown_content: str) -> str:
     """Extracts the plan title from the first H1 header in markdown."""
     lines = markdown_content.splitlines()
@@ -22,11 +26,8 @@ def _extract_plan_title(markdown_content: str) -> str:
 
 def _sanitize_for_path(text: str) -> str:
     """Converts a string into a slug suitable for file/directory names."""
-    text = text.lower()
-    text = re.sub(r'\s+', '-', text)  # Replace whitespace with hyphens
-    text = re.sub(r'[^a-z0-9\-]', '', text)  # Keep only lowercase letters, digits, and hyphens
-    text = re.sub(r'-+', '-', text)  # Replace multiple hyphens with a single hyphen
-    text = text.strip('-')  # Remove leading/trailing hyphens
+    text = _SLUG_DROP_RE.sub('', text.lower())
+    text = _SLUG_SEPARATOR_RE.sub('-', text).strip('-')
     if not text:
         return "default-plan-title"
     return text
@@ -71,7 +72,27 @@ def _process_and_save_plan(plan_content: str, feature_description: str, session_
         print(f"\nError saving files to {plan_dir}: {e}", file=sys.stderr)
         # No sys.exit here, let the caller decide
 
+class _StderrLogHandler(logging.StreamHandler):
+    """
+    Writes log records to whatever sys.stderr is when they are emitted, rather than the stream
+    at setup time, so that messages logged while the Textual app has redirected stderr
+    don't draw over the UI.
+    """
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = sys.stderr
+        super().emit(record)
+
+class _PlainLogFormatter(logging.Formatter):
+    """Formats log records as plain lines, with a "Warning: " prefix on warnings."""
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        return f"Warning: {message}" if record.levelno == logging.WARNING else message
+
 def main(): # Wrap existing __main__ block in a main() function
+    # llm_planner and the plan caches report progress and problems through logging; show them on stderr as plain lines
+    log_handler = _StderrLogHandler()
+    log_handler.setFormatter(_PlainLogFormatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[log_handler])
     parser = argparse.ArgumentParser(description="Generate a development plan.")
     parser.add_argument(
         "--plan-file",
@@ -1,18 +1,17 @@
 import argparse
+import os
 import sys
+import tempfile
 from pathlib import Path
-import re
+from typing import Iterable
 
-# Add the project root to sys.path to allow for absolute imports.
-# This assumes section_editor.py is in lazyaider/ and the project root is its parent.
-project_root = Path(__file__).resolve().parent.parent
-if str(project_root) not in sys.path:
-    sys.path.insert(0, str(project_root))
-
-from lazyaider.feature_input_app import FeatureInputApp
-
-# Config is loaded when lazyaider.config is imported (e.g., by FeatureInputApp or other modules).
-# This ensures FeatureInputApp can access theme settings.
+# When run as a script (python lazyaider/section_editor.py), add the project root to sys.path to allow
+# for absolute imports. This assumes section_editor.py is in lazyaider/ and the project root is its parent.
+# Under `python -m lazyaider.section_editor` (how the sidebar runs it) the package is already importable.
+if not __package__:
+    project_root = Path(__file__).resolve().parent.parent
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
 
 def extract_section_from_markdown(markdown_content: str, section_index: int) -> tuple[str | None, int, int]:
     """
@@ -21,23 +20,58 @@ def extract_section_from_markdown(markdown_content: str, section_index: int) ->
     Returns the section text (including the header line and trailing newline if present),
     start position (inclusive), and end position (exclusive) in the original content.
     """
-    headers = list(re.finditer(r"^## .*", markdown_content, re.MULTILINE))
-
-    if not 0 <= section_index < len(headers):
+    if section_index < 0:
         return None, -1, -1
-
-    section_header_match = headers[section_index]
-    content_start_pos = section_header_match.start() # Start of the "## Title" line
-
-    if section_index + 1 < len(headers):
-        next_header_match = headers[section_index + 1]
-        content_end_pos = next_header_match.start() # End is start of next "## Title" line
+    # Headers are the fixed string "## " at the start of a line, so they are found with str.find
+    # for "\n## " rather than a regex. Only the headers up to this section's, and the next one, are looked for.
+    if markdown_content.startswith("## "):
+        content_start_pos = 0
+        headers_to_skip = section_index
+    else:
+        content_start_pos = -1
+        headers_to_skip = section_index + 1
+    for _ in range(headers_to_skip):
+        hit = markdown_content.find("\n## ", content_start_pos + 1)
+        if hit == -1:
+            return None, -1, -1
+        content_start_pos = hit + 1 # Start of the "## Title" line, after the newline
+
+    next_hit = markdown_content.find("\n## ", content_start_pos)
+    if next_hit != -1:
+        content_end_pos = next_hit + 1 # End is start of next "## Title" line
     else:
         content_end_pos = len(markdown_content) # End is EOF
 
     section_text = markdown_content[content_start_pos:content_end_pos]
     return section_text, content_start_pos, content_end_pos
 
+def _replace_file_contents(file_path: Path, parts: Iterable[str]) -> None:
+    """
+    Replaces the contents of file_path with the concatenation of parts, encoded as UTF-8.
+    The parts are written to a temporary file next to it, which is then renamed over the
+    original, so a crash mid-write never leaves a truncated plan. The file's permissions
+    are kept, and a symlinked file stays a symlink.
+    """
+    target_path = os.path.realpath(file_path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(target_path), prefix=f".{os.path.basename(target_path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # One writelines call: the encoded parts are copied into the buffer and flushed
+            # together, instead of one Python-level write call per part
+            f.writelines(part.encode("utf-8") for part in parts)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, os.stat(target_path).st_mode & 0o7777)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 def main():
     parser = argparse.ArgumentParser(description="Edit a specific section of a markdown plan file.")
     parser.add_argument("--file-path", required=True, type=str, help="Full path to the 'current-<plan_name>.md' file.")
@@ -53,7 +87,9 @@ def main():
         sys.exit(1)
 
     try:
-        original_content = markdown_file_path.read_text(encoding="utf-8")
+        # Bytes in, bytes out: skips the text layer's newline translation, and the parts of the
+        # file outside the edited section are written back exactly as they were
+        original_content = markdown_file_path.read_bytes().decode("utf-8")
     except Exception as e:
         print(f"Error reading file {markdown_file_path}: {e}", file=sys.stderr)
         sys.exit(1)
@@ -68,6 +104,10 @@ def main():
     if plan_name_for_title.startswith("current-"):
         plan_name_for_title = plan_name_for_title[len("current-"):]
 
+    # Imported only now that the file and section are known to be valid: this loads Textual,
+    # which the error exits above don't need. Config is loaded when lazyaider.config is imported
+    # (e.g., by FeatureInputApp), which ensures FeatureInputApp can access theme settings.
+    from lazyaider.feature_input_app import FeatureInputApp
     app = FeatureInputApp(
         mode="edit_section",
         initial_text=section_text, # Pass the full section text including header
@@ -75,7 +115,10 @@ def main():
     )
     edited_text_result = app.run() # Returns edited string or None
 
-    if edited_text_result is not None:
+    if edited_text_result == section_text:
+        # Saved without changes: the file already has this content, so don't rewrite it
+        print(f"No changes to section {section_idx + 1} of {markdown_file_path.name}.", file=sys.stdout)
+    elif edited_text_result is not None:
         # The edited_text_result is the new full content for this section.
         # We need to ensure it fits well when reinserted.
         # Markdown sections are typically separated by newlines.
@@ -95,10 +138,13 @@ def main():
         # If processed_edited_text is now empty, it will effectively delete the section.
         # If it was followed by another section, the `original_content[end_pos:]` will handle that.
 
-        new_content = original_content[:start_pos] + processed_edited_text + original_content[end_pos:]
-
         try:
-            markdown_file_path.write_text(new_content, encoding="utf-8")
+            # Write the unchanged head, the edited section and the unchanged tail in turn,
+            # rather than first joining them into a second copy of the whole file
+            _replace_file_contents(
+                markdown_file_path,
+                (original_content[:start_pos], processed_edited_text, original_content[end_pos:])
+            )
             # Output to stdout can be captured by tmux if needed (e.g., for status messages)
             print(f"Section {section_idx + 1} saved to {markdown_file_path.name}", file=sys.stdout)
         except Exception as e:
@@ -0,0 +1,144 @@
+"""
+Optional semantic cache of generated plans.
+
+plan_cache only matches identical requests; this also reuses a plan when a new feature description
+is a close paraphrase of one already planned against the same prompt template, repository map and
+model. Descriptions are embedded with sentence-transformers and compared by cosine similarity.
+
+Entries live in their own table of plan_cache's SQLite database, so several lazyaider sessions can
+share them without overwriting each other's additions. Only the most recent MAX_ENTRIES are kept,
+and entries expire after the configured 'llm_cache_ttl' seconds like exact matches do.
+
+It is only used when 'llm_semantic_cache_enabled' is set in the config, and needs the optional
+'semantic-cache' dependencies (pip install "lazyaider[semantic-cache]"). Loading the embedding model
+takes a few seconds, so it is done on first use, in whichever worker thread performs the lookup.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from . import config
+from .plan_cache import CACHE_DIR, CACHE_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+MAX_ENTRIES = 1000 # Oldest entries are evicted beyond this, which also bounds the cost of a lookup
+
+_connection: sqlite3.Connection | None = None
+_connection_failed = False # Set once opening the database failed, so we don't retry (and warn) on every call
+_embedding_model = None
+_unavailable = False # Set once the optional dependencies turned out to be missing, so we warn only once
+_model_lock = threading.Lock() # Only serializes loading the model, which can take seconds
+_lock = threading.Lock() # Guards the database connection
+
+def _ttl_seconds() -> int:
+    """The configured lifetime of an entry, in seconds."""
+    return config.settings.get(config.KEY_LLM_CACHE_TTL, config.DEFAULT_LLM_CACHE_TTL)
+
+def _get_embedding_model():
+    """Loads the embedding model on first use. Returns None if sentence-transformers is not installed."""
+    global _embedding_model, _unavailable
+    if _embedding_model is not None or _unavailable:
+        return _embedding_model
+    with _model_lock:
+        if _embedding_model is None and not _unavailable:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                logger.warning(
+                    "'llm_semantic_cache_enabled' is set but sentence-transformers is not installed. "
+                    "Install it with: pip install \"lazyaider[semantic-cache]\". Semantic plan cache disabled."
+                )
+                _unavailable = True
+                return None
+            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+def _get_connection() -> sqlite3.Connection | None:
+    """Opens the cache database on first use and drops expired entries. Must be called with _lock held."""
+    global _connection, _connection_failed
+    if _connection is not None or _connection_failed:
+        return _connection
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        connection = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_plans "
+            "(id INTEGER PRIMARY KEY, context TEXT, vector BLOB, plan TEXT, ts INTEGER)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS semantic_plans_context ON semantic_plans (context)")
+        connection.execute("DELETE FROM semantic_plans WHERE ts < ?", (int(time.time()) - _ttl_seconds(),))
+        connection.commit()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Could not open semantic plan cache at %s: %s. Semantic plan cache disabled.", CACHE_DB_PATH, e)
+        _connection_failed = True
+        return None
+    _connection = connection
+    return _connection
+
+def _embed(embedding_model, text: str):
+    """Returns the normalized embedding vector of text, as float32."""
+    import numpy as np # Installed with sentence-transformers
+    return np.asarray(embedding_model.encode([text], normalize_embeddings=True)[0], dtype=np.float32)
+
+def lookup(context_key: str, feature_description: str) -> str | None:
+    """
+    Returns the plan of the most similar description planned under the same context_key,
+    if its cosine similarity reaches 'semantic_cache_threshold'; otherwise None.
+    """
+    embedding_model = _get_embedding_model()
+    if embedding_model is None:
+        return None
+    with _lock:
+        connection = _get_connection()
+        if connection is None:
+            return None
+        try:
+            rows = connection.execute(
+                "SELECT vector, plan FROM semantic_plans WHERE context = ? AND ts >= ?",
+                (context_key, int(time.time()) - _ttl_seconds())
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Could not read from semantic plan cache: %s", e)
+            return None
+    if not rows:
+        return None
+    import numpy as np
+    vector = _embed(embedding_model, feature_description)
+    # Skip vectors of another size, e.g. stored by a different embedding model
+    candidates = [(np.frombuffer(row[0], dtype=np.float32), row[1]) for row in rows if len(row[0]) == vector.nbytes]
+    if not candidates:
+        return None
+    similarities = np.stack([candidate[0] for candidate in candidates]) @ vector # Vectors are normalized: dot product = cosine
+    best_index = int(np.argmax(similarities))
+    threshold = config.settings.get(config.KEY_SEMANTIC_CACHE_THRESHOLD, config.DEFAULT_SEMANTIC_CACHE_THRESHOLD)
+    if similarities[best_index] < threshold:
+        return None
+    logger.info("Semantic plan cache hit (similarity %.3f).", similarities[best_index])
+    return candidates[best_index][1]
+
+def add(context_key: str, feature_description: str, plan: str) -> None:
+    """Stores plan as the result for feature_description under context_key, evicting the oldest entries beyond MAX_ENTRIES."""
+    embedding_model = _get_embedding_model()
+    if embedding_model is None:
+        return
+    vector = _embed(embedding_model, feature_description)
+    with _lock:
+        connection = _get_connection()
+        if connection is None:
+            return
+        try:
+            connection.execute(
+                "INSERT INTO semantic_plans (context, vector, plan, ts) VALUES (?, ?, ?, ?)",
+                (context_key, vector.tobytes(), plan, int(time.time()))
+            )
+            connection.execute(
+                "DELETE FROM semantic_plans WHERE id NOT IN "
+                "(SELECT id FROM semantic_plans ORDER BY ts DESC, id DESC LIMIT ?)",
+                (MAX_ENTRIES,)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("Could not write to semantic plan cache: %s", e)
@@ -1,17 +1,31 @@
 import os
+import re
+from typing import Iterable
 from textual.app import App, ComposeResult
 from textual.containers import VerticalScroll, Container # VerticalScroll is not used, but keep for now if other parts might use it.
-from textual.widgets import Button, Footer, Header, Label, Input, Static, ListView, ListItem
+from textual.widgets import Button, Footer, Header, Label, Input, Static, OptionList
 from textual.validation import Regex, Validator, ValidationResult
 from textual.css.query import NoMatches
 from textual.screen import ModalScreen
 from textual.binding import Binding # For potential future use
+from textual.timer import Timer
+
+
+# A valid session name: alphanumeric characters and hyphens, starting and ending with an alphanumeric one.
+# [^\W_] is a letter or digit (str.isalnum), the same test SessionNameValidator spells out below.
+_SESSION_NAME_RE = re.compile(r"[^\W_](?:(?:[^\W_]|-)*[^\W_])?")
+
+# How long typing must pause before the rename input is validated
+VALIDATION_DEBOUNCE_SECONDS = 0.15
 
 
 class SessionNameValidator(Validator):
     def validate(self, value: str) -> ValidationResult:
         # tmux session names cannot contain periods or colons, and must not be empty.
         # For simplicity, let's restrict to alphanumeric and hyphens, not starting/ending with hyphen.
+        if _SESSION_NAME_RE.fullmatch(value): # One regex match for the usual, valid case (revalidated on every keystroke)
+            return self.success()
+        # Invalid: find the specific problem to report
         if not value:
             return self.failure("Session name cannot be empty.")
         if not value[0].isalnum() or not value[-1].isalnum():
@@ -28,10 +42,11 @@ class RenameSessionScreen(ModalScreen[str | None]):
 
     # CSS is now in session_selector.tcss
 
-    def __init__(self, current_name: str, existing_sessions: list[str]):
+    def __init__(self, current_name: str, existing_sessions: Iterable[str]):
         super().__init__()
         self.current_name = current_name
-        self.existing_sessions = existing_sessions # Other existing session names to check for duplicates
+        self.existing_sessions: frozenset[str] = frozenset(existing_sessions) # Other existing session names to check for duplicates
+        self._validate_timer: Timer | None = None # Pending debounced validation of the input, see on_input_changed
 
     def compose(self) -> ComposeResult:
         with Container(id="rename_dialog"):
@@ -39,7 +54,9 @@ class RenameSessionScreen(ModalScreen[str | None]):
             yield Input(
                 id="new_session_name_input_modal", # Unique ID for this input
                 placeholder="Enter new session name",
-                validators=[SessionNameValidator()] # Reuse the validator
+                validators=[SessionNameValidator()], # Reuse the validator
+                # Not on every change: on_input_changed validates once typing pauses, and submitting revalidates
+                validate_on=["submitted"]
             )
             with Container(classes="button_row"):
                 yield Button("Rename", id="btn_rename_modal", variant="primary")
@@ -49,7 +66,7 @@ class RenameSessionScreen(ModalScreen[str | None]):
         """Focus the input field when the modal is mounted."""
         self.query_one("#new_session_name_input_modal", Input).focus()
 
-    async def on_button_pressed(self, event: Button.Pressed) -> None:
+    def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button presses within the modal."""
         if event.button.id == "btn_rename_modal":
             input_widget = self.query_one("#new_session_name_input_modal", Input)
@@ -83,8 +100,18 @@ class RenameSessionScreen(ModalScreen[str | None]):
         if event.input.id == "new_session_name_input_modal":
             event.input.border_title = None
             event.input.styles.border = None
-
-    async def on_input_submitted(self, event: Input.Submitted) -> None:
+            # Debounce validation: restart the timer on each keystroke, so a burst of typing validates once
+            if self._validate_timer is not None:
+                self._validate_timer.stop()
+            self._validate_timer = self.set_timer(VALIDATION_DEBOUNCE_SECONDS, self._validate_input)
+
+    def _validate_input(self) -> None:
+        """Validates the input's current value, updating its valid/invalid styling."""
+        self._validate_timer = None
+        input_widget = self.query_one("#new_session_name_input_modal", Input)
+        input_widget.validate(input_widget.value)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
         """Handle Enter key press on the input field to attempt rename."""
         if event.input.id == "new_session_name_input_modal":
             # Simulate the "Rename" button press logic
@@ -113,22 +140,25 @@ class RenameSessionScreen(ModalScreen[str | None]):
             self.dismiss(new_name)
 
 
-class SessionListView(ListView):
-    """Custom ListView to trigger app exit on Enter key press."""
+class SessionListView(OptionList):
+    """
+    Custom OptionList to trigger app exit on Enter key press.
+    An OptionList rather than a ListView: it renders only the visible rows instead of mounting a
+    widget per session, so the selector opens just as fast with hundreds of sessions.
+    """
 
-    def action_select_cursor(self) -> None:
-        """Called when Enter is pressed (or other selection actions)."""
-        super().action_select_cursor()  # Perform default selection logic (posts ListView.Selected)
+    # OptionList also calls action_select on mouse clicks, which must only select, so Enter gets its own action
+    BINDINGS = [
+        Binding("enter", "select_and_use", "Select", show=False),
+    ]
+
+    def action_select_and_use(self) -> None:
+        """Called when Enter is pressed."""
+        self.action_select()  # Perform default selection logic (posts OptionList.OptionSelected)
         # After the default selection logic (which updates highlight and posts message),
         # tell the app to process this as a confirmed selection.
         # self.app will be the SessionSelectorApp instance.
-        # We need to ensure action_select_session is awaitable if it becomes async,
-        # but actions are typically synchronous unless they schedule work.
-        # For now, direct call is fine. If action_select_session becomes async,
-        # we might need to self.app.call_later(self.app.action_select_session) or similar.
-        # However, action_select_session is currently async.
-        # Actions on widgets are typically not async.
-        # Let's schedule the call to the async app action.
+        # The call is scheduled on the app rather than made directly, so it runs from the app's own message loop.
         self.app.call_later(self.app.action_select_session)
 
 
@@ -149,6 +179,14 @@ class SessionSelectorApp(App[str | None]):
         # To track renames: dict[original_name, current_name_after_renames]
         # This is for the caller to know what renames happened if a session is picked after renaming.
         self.renamed_map: dict[str, str] = {}
+        # Indexes kept in step with active_sessions and renamed_map, so a rename needs no list scans
+        self._name_to_index: dict[str, int] = {name: i for i, name in enumerate(self.active_sessions)}
+        self._current_to_original: dict[str, str] = {} # Reverse of renamed_map
+        # Widgets looked up once in on_mount; _list_view stays None when there are no sessions to list
+        self._list_view: SessionListView | None = None
+        self._use_selected_button: Button | None = None
+        self._rename_selected_button: Button | None = None
+        self._create_new_button: Button | None = None
 
         # self.theme will be set in on_mount
 
@@ -168,6 +206,7 @@ class SessionSelectorApp(App[str | None]):
 
     def _generate_unique_name_from_base(self, base_name: str, existing_names: list[str]) -> str:
         """Generates a unique name: base_name, then base_name-1, base_name-2, etc."""
+        existing_names = set(existing_names) # Each candidate is checked, so make the checks O(1)
         if base_name not in existing_names:
             return base_name
         i = 1
@@ -186,10 +225,8 @@ class SessionSelectorApp(App[str | None]):
             if self.active_sessions:
                 yield Label("Active Sessions:")
                 # Use the custom SessionListView
-                with SessionListView(id="session_list_view"):
-                    for session in self.active_sessions:
-                        list_item = ListItem(Label(session), name=session)
-                        yield list_item
+                # Options are in active_sessions order, so an option's index is the session's index
+                yield SessionListView(*self.active_sessions, id="session_list_view")
             else:
                 yield Static("No active managed sessions found.")
             # Buttons for actions
@@ -201,7 +238,7 @@ class SessionSelectorApp(App[str | None]):
                 yield Button("Cancel", id="btn_cancel", variant="error")
             yield Footer()
 
-    async def on_mount(self) -> None: # Make async
+    def on_mount(self) -> None:
         """Called when app is mounted."""
         # Apply theme from config when app is mounted
         from lazyaider import config as app_config_module
@@ -215,137 +252,115 @@ class SessionSelectorApp(App[str | None]):
             # This line might raise InvalidThemeError if 'theme_name_from_config' is not a registered theme.
             self.theme = theme_name_from_config
 
-        list_view = None
+        self._use_selected_button = self.query_one("#btn_use_selected", Button)
+        self._rename_selected_button = self.query_one("#btn_rename_selected", Button)
+        self._create_new_button = self.query_one("#btn_create_new", Button)
         try:
-            # ListView is only composed if self.active_sessions is truthy.
-            list_view = self.query_one(ListView)
+            # SessionListView is only composed if self.active_sessions is truthy.
+            self._list_view = self.query_one(SessionListView)
         except NoMatches:
-            pass # list_view remains None, handled below.
-
-        if list_view and list_view.children: # Active sessions exist and ListView is populated.
-            list_view.index = 0 # Select the first item.
-            # Manually update selection state and button states, as setting index
-            # programmatically doesn't fire the on_list_view_selected event.
-            first_item_widget = list_view.children[0]
-            if isinstance(first_item_widget, ListItem) and first_item_widget.name:
-                self.selected_session_name = first_item_widget.name
-                self.query_one("#btn_use_selected", Button).disabled = False
-                self.query_one("#btn_rename_selected", Button).disabled = False
-            else:
-                # Fallback: if the first item isn't as expected (e.g., no name), keep buttons disabled.
-                self.selected_session_name = None # Ensure it's cleared
-                self.query_one("#btn_use_selected", Button).disabled = True
-                self.query_one("#btn_rename_selected", Button).disabled = True
+            pass # _list_view remains None, handled below.
+        list_view = self._list_view
+
+        if list_view and list_view.option_count: # Active sessions exist and the list is populated.
+            list_view.highlighted = 0 # Select the first item.
+            # Manually update selection state and button states, as setting the highlight
+            # programmatically doesn't fire the on_option_list_option_selected event.
+            self.selected_session_name = self.active_sessions[0]
+            self._use_selected_button.disabled = False
+            self._rename_selected_button.disabled = False
             list_view.focus()
         else:
             # This block covers:
-            # 1. No active sessions (so list_view is None or ListView was not composed).
-            # 2. Active sessions, but ListView somehow has no children (e.g., self.active_sessions was empty list).
-            self.query_one("#btn_use_selected", Button).disabled = True
-            self.query_one("#btn_rename_selected", Button).disabled = True
-            try:
-                # Focus on "Create New" button as it's the most likely action.
-                self.query_one("#btn_create_new", Button).focus()
-            except NoMatches:
-                # This should ideally not happen if the button is always composed.
-                # If it does, focus will fall back to Textual's default.
-                pass
+            # 1. No active sessions (so list_view is None or SessionListView was not composed).
+            # 2. Active sessions, but the list somehow has no options (e.g., self.active_sessions was empty list).
+            self._use_selected_button.disabled = True
+            self._rename_selected_button.disabled = True
+            # Focus on "Create New" button as it's the most likely action.
+            self._create_new_button.focus()
 
     def _populate_session_list(self) -> None:
         """Populates or repopulates the session list view."""
-        try:
-            list_view = self.query_one(ListView)
-            list_view.clear() # Clear existing items before repopulating
-            for session_name in self.active_sessions:
-                list_item = ListItem(Label(session_name), name=session_name)
-                list_view.append(list_item)
-        except NoMatches:
-            # This might happen if the list view isn't present (e.g., no active sessions at start)
-            # or if called at an unexpected time.
-            pass
+        list_view = self._list_view
+        if list_view is None:
+            # The list view isn't present (no active sessions at start)
+            return
+        list_view.set_options(self.active_sessions) # Replaces any existing options
 
-    async def on_list_view_selected(self, event: ListView.Selected) -> None: # Renamed from on_list_item_selected
+    def on_option_list_option_selected(self, event: OptionList.OptionSelected) -> None: # Renamed from on_list_view_selected
         """Handle list item selection to enable/disable context-sensitive buttons."""
-        if event.item and event.item.name: # event.item should be the selected ListItem
-            self.selected_session_name = event.item.name
-            self.query_one("#btn_use_selected", Button).disabled = False
-            self.query_one("#btn_rename_selected", Button).disabled = False
+        if 0 <= event.option_index < len(self.active_sessions): # The option's index is the session's index
+            self.selected_session_name = self.active_sessions[event.option_index]
+            self._use_selected_button.disabled = False
+            self._rename_selected_button.disabled = False
         else:
             # This case (no item.name) should ideally not happen if an item is truly selected.
             # Safety net:
             self.selected_session_name = None
-            self.query_one("#btn_use_selected", Button).disabled = True
-            self.query_one("#btn_rename_selected", Button).disabled = True
+            self._use_selected_button.disabled = True
+            self._rename_selected_button.disabled = True
     def _clear_selection_effects(self) -> None:
         """Clears current selection state and disables related buttons."""
         self.selected_session_name = None
-        try:
-            list_view = self.query_one(ListView)
-            list_view.index = -1 # Deselects in the ListView widget
-        except NoMatches:
-            pass
-        self.query_one("#btn_use_selected", Button).disabled = True
-        self.query_one("#btn_rename_selected", Button).disabled = True
+        if self._list_view is not None:
+            self._list_view.highlighted = None # Deselects in the list widget
+        self._use_selected_button.disabled = True
+        self._rename_selected_button.disabled = True
 
-    async def _handle_rename_result(self, new_name: str | None) -> None:
+    def _handle_rename_result(self, new_name: str | None) -> None:
         """Callback function executed after the RenameSessionScreen is dismissed."""
         if new_name and self.selected_session_name: # new_name is not None and a session was selected for rename
             old_name = self.selected_session_name
             if old_name == new_name: # No actual change in name
                 # Optionally, re-focus list view or provide feedback
-                self.query_one(ListView).focus()
+                if self._list_view is not None:
+                    self._list_view.focus()
                 return
 
             # Update the session name in the internal list
-            try:
-                idx = self.active_sessions.index(old_name)
-                self.active_sessions[idx] = new_name
-            except ValueError:
+            idx = self._name_to_index.pop(old_name, None)
+            if idx is None:
                 # This should not happen if selected_session_name was valid from active_sessions
                 self.notify(f"Error: Original session '{old_name}' not found in list.", severity="error")
                 return # Abort if inconsistent state
+            self.active_sessions[idx] = new_name
+            self._name_to_index[new_name] = idx
 
             # Update the renamed_map to track changes from original names
-            # If old_name was already a renamed name, find its original source
-            original_name_for_old_session = old_name
-            for original, current_renamed_val in self.renamed_map.items():
-                if current_renamed_val == old_name:
-                    original_name_for_old_session = original
-                    break
+            # If old_name was already a renamed name, map the change back to its original source
+            original_name_for_old_session = self._current_to_original.pop(old_name, old_name)
             self.renamed_map[original_name_for_old_session] = new_name
-            # Refresh the ListView to show the new name
-            self._populate_session_list()
-            # Try to re-select the newly renamed item in the ListView
-            try:
-                list_view = self.query_one(ListView)
-                new_item_index = -1
-                for i, child_item in enumerate(list_view.children): # Iterate through ListItems
-                    if isinstance(child_item, ListItem) and child_item.name == new_name:
-                        new_item_index = i
-                        break
+            self._current_to_original[new_name] = original_name_for_old_session
+            # Show the new name: only the renamed item changes, so relabel just that option rather
+            # than rebuilding the whole list (which would also lose the scroll position)
+            list_view = self._list_view
+            if list_view is not None:
+                # The options are in active_sessions order, so the item sits at the same index
+                new_item_index = idx if idx < list_view.option_count else -1
 
                 if new_item_index != -1:
-                    list_view.index = new_item_index # Highlight the item
+                    list_view.replace_option_prompt_at_index(new_item_index, new_name)
+                    list_view.highlighted = new_item_index # Highlight the item
                     self.selected_session_name = new_name # Update internal selection state
                     # Ensure buttons are correctly enabled for the new selection
-                    self.query_one("#btn_use_selected", Button).disabled = False
-                    self.query_one("#btn_rename_selected", Button).disabled = False
+                    self._use_selected_button.disabled = False
+                    self._rename_selected_button.disabled = False
                     list_view.focus() # Ensure the list view has focus
                 else:
-                    # If item not found (should not happen if _populate_session_list is correct)
+                    # If item not found (should not happen: the list mirrors active_sessions)
                     self._clear_selection_effects() # Clear selection as a fallback
-            except NoMatches: # Should not happen if list_view exists
+            else: # Should not happen: renaming needs a selected session from the list
                  self._clear_selection_effects()
 
         # If new_name is None (modal was cancelled), selection remains as it was.
         # Ensure focus returns to an appropriate widget in the main app.
-        try:
-            self.query_one(ListView).focus()
-        except NoMatches: # If no listview (e.g. all sessions deleted then one created and renamed)
-            self.query_one("#btn_create_new").focus()
+        if self._list_view is not None:
+            self._list_view.focus()
+        else: # If no listview (e.g. all sessions deleted then one created and renamed)
+            self._create_new_button.focus()
 
 
-    async def on_button_pressed(self, event: Button.Pressed) -> None:
+    def on_button_pressed(self, event: Button.Pressed) -> None:
         button_id = event.button.id
 
         if button_id == "btn_use_selected":
@@ -360,7 +375,7 @@ class SessionSelectorApp(App[str | None]):
         elif button_id == "btn_rename_selected":
             if self.selected_session_name:
                 # Pass other existing session names for validation in the modal
-                other_sessions = [s for s in self.active_sessions if s != self.selected_session_name]
+                other_sessions = frozenset(self.active_sessions) - {self.selected_session_name}
                 self.app.push_screen(
                     RenameSessionScreen(self.selected_session_name, other_sessions),
                     self._handle_rename_result # Pass the callback
@@ -382,7 +397,7 @@ class SessionSelectorApp(App[str | None]):
         elif button_id == "btn_cancel":
             self.exit(None) # Exit the app, returning None
 
-    async def action_try_select_session_with_enter(self) -> None:
+    def action_try_select_session_with_enter(self) -> None:
         """
         Attempts to submit the current selection via Enter key,
         but only if no modal screen is active.
@@ -390,23 +405,19 @@ class SessionSelectorApp(App[str | None]):
         # self.screen_stack[0] is the SessionSelectorApp's main screen.
         # If len > 1, another screen (e.g., modal, command palette) is on top.
         if len(self.screen_stack) == 1:
-            await self.action_select_session()
+            self.action_select_session()
         # If a modal or other screen is active, do nothing, allowing that screen
         # to handle the Enter key.
 
-    async def action_select_session(self) -> None:
+    def action_select_session(self) -> None:
         """Action to use the currently selected session. Can be called by button or Enter binding."""
-        # Only act if a session is selected AND the ListView has focus.
+        # Only act if a session is selected AND the session list has focus.
         # This prevents Enter from triggering session selection when focus is on
         # other elements like the command input in the Footer or command palette.
-        try:
-            list_view = self.query_one(ListView)
-            if list_view.has_focus and self.selected_session_name:
-                self.exit(self.selected_session_name)
-        except NoMatches:
-            # If ListView doesn't exist (e.g., no sessions), this action shouldn't fire.
-            pass
-        # If conditions are not met (e.g., ListView not focused, or no session selected),
+        # If the session list doesn't exist (e.g., no sessions), this action shouldn't fire.
+        if self._list_view is not None and self._list_view.has_focus and self.selected_session_name:
+            self.exit(self.selected_session_name)
+        # If conditions are not met (e.g., the list not focused, or no session selected),
         # Enter should be handled by the focused widget or do nothing if no other
         # binding/handler for Enter exists for that widget.
 
@@ -712,6 +712,8 @@ class Sidebar(App):
                 # Requires config module and settings to be accessible
                 from lazyaider import config as app_config # late import
                 app_config.remove_session_from_config(session_to_kill)
+                # Killing the session also kills this process, so write the config now
+                app_config.flush_config()
                 self.log(f"Removed session '{session_to_kill}' from config.")
 
                 tmux_utils.kill_session(session_to_kill)
@@ -11,6 +11,10 @@ def manage_tmux_session(session_name: str, app_command: str, shell_pane_target:
     Then attaches to the session.
     """
     try:
+        # Write any pending config changes first: the app started in the session below reads the
+        # config file, and attach_session replaces this process, so atexit won't run
+        config.flush_config()
+
         # Check if the tmux session already exists
         if not tmux_utils.session_exists(session_name):
             # Session does not exist, create and configure it